@@ -1,11 +1,20 @@
 # resume-backend/health/views.py
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, renderer_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.renderers import JSONRenderer
 
+from resumes.render_pool import render_metrics
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 @renderer_classes([JSONRenderer])
 def health_check(request):
-    return Response({"status": "ok"})
\ No newline at end of file
+    return Response({"status": "ok"})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([JSONRenderer])
+def render_metrics_view(request):
+    """PDF render counters of the web process that served this request."""
+    return Response(render_metrics.snapshot())
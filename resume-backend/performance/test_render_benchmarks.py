@@ -0,0 +1,184 @@
+"""
+performance/test_render_benchmarks.py
+Offline benchmark suite for resume rendering.
+
+Builds synthetic resumes with 1, 10 and 50 entries per section and times each stage
+separately for every bundled template: sanitize_resume_data, render_to_string and
+WeasyPrint write_pdf. Peak Python memory (tracemalloc) and output sizes are recorded
+too. Results are written as JSON and compared against a stored baseline.
+
+Skipped unless RUN_RENDER_BENCHMARKS=1, e.g.:
+    RUN_RENDER_BENCHMARKS=1 pytest performance/test_render_benchmarks.py
+
+Environment:
+    RENDER_BENCHMARK_REPEAT           runs per stage, the median is reported (default 5)
+    RENDER_BENCHMARK_OUTPUT           results file (default performance/results/render_benchmarks.json)
+    RENDER_BENCHMARK_BASELINE         baseline file (default performance/render_baseline.json)
+    RENDER_BENCHMARK_TOLERANCE        allowed slowdown vs. baseline, 0.25 = 25% (default 0.25)
+    RENDER_BENCHMARK_UPDATE_BASELINE  set to 1 to overwrite the baseline with this run
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from resumes.models import Resume, PersonalDetails, Education, WorkExperience, Project, Skill, Award
+from resumes.serializers import sanitize_resume_data
+from resumes.render_worker import RenderJob, render_pdf
+from resumes.template_registry import template_registry
+
+User = get_user_model()
+
+PERFORMANCE_DIR = Path(__file__).resolve().parent
+SECTION_SIZES = (1, 10, 50)
+TEMPLATES = ("template_classic", "template_deedy")
+NOISE_FLOOR_MS = 5.0
+
+REPEAT = int(os.environ.get("RENDER_BENCHMARK_REPEAT", 5))
+OUTPUT_PATH = Path(os.environ.get("RENDER_BENCHMARK_OUTPUT", PERFORMANCE_DIR / "results" / "render_benchmarks.json"))
+BASELINE_PATH = Path(os.environ.get("RENDER_BENCHMARK_BASELINE", PERFORMANCE_DIR / "render_baseline.json"))
+TOLERANCE = float(os.environ.get("RENDER_BENCHMARK_TOLERANCE", 0.25))
+
+
+def build_synthetic_resume(user, entries):
+    """Create a published resume with `entries` rows in every repeatable section."""
+    resume = Resume.objects.create(user=user, title=f"Benchmark {entries}", resume_status="PUBLISHED")
+    PersonalDetails.objects.create(
+        resume=resume, first_name="Bench", last_name="Mark", email="bench@example.com",
+        phone="+1234567890", website="https://example.com", github="https://github.com/example",
+        linkedin="https://linkedin.com/in/example",
+    )
+    description = "\n".join(f"Delivered improvement number {i} across the platform" for i in range(4))
+    Education.objects.bulk_create([
+        Education(resume=resume, institution=f"University {i}", major="Computer Science",
+                  start_date=datetime.date(2010, 9, 1), end_date=datetime.date(2014, 6, 1), cgpa="3.80")
+        for i in range(entries)
+    ])
+    WorkExperience.objects.bulk_create([
+        WorkExperience(resume=resume, employer=f"Company {i}", role="Engineer", location="Remote",
+                       start_date=datetime.date(2015, 1, 1), end_date=datetime.date(2018, 1, 1),
+                       description=description)
+        for i in range(entries)
+    ])
+    Project.objects.bulk_create([
+        Project(resume=resume, title=f"Project {i}", description="A synthetic benchmark project.",
+                technologies="Python, Django, PostgreSQL", start_date=datetime.date(2019, 1, 1))
+        for i in range(entries)
+    ])
+    Skill.objects.bulk_create([
+        Skill(resume=resume, skill_name=f"Skill {i}", skill_type="TECHNICAL", proficiency="Expert")
+        for i in range(entries)
+    ])
+    Award.objects.bulk_create([
+        Award(resume=resume, name=f"Award {i}", description="Recognised for excellence.", year=2020)
+        for i in range(entries)
+    ])
+    return resume
+
+
+def measure(func, repeat=REPEAT):
+    """
+    Time `repeat` runs of `func`, then run it once more under tracemalloc for peak memory
+    (tracing slows allocation-heavy code, so it is kept out of the timed runs).
+    Returns (result, stats dict).
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return result, {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare_to_baseline(results, baseline):
+    """Return human readable regressions of `results` against `baseline`."""
+    regressions = []
+    for case, stages in results.items():
+        for stage, stats in stages.items():
+            expected = baseline.get(case, {}).get(stage)
+            if not expected:
+                continue
+            limit = expected["median_ms"] * (1 + TOLERANCE)
+            if stats["median_ms"] > limit and stats["median_ms"] - expected["median_ms"] > NOISE_FLOOR_MS:
+                regressions.append(
+                    f"{case} {stage}: {stats['median_ms']}ms vs baseline {expected['median_ms']}ms"
+                )
+    return regressions
+
+
+@unittest.skipUnless(os.environ.get("RUN_RENDER_BENCHMARKS") == "1", "set RUN_RENDER_BENCHMARKS=1 to run")
+class RenderBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username="benchmark", email="benchmark@example.com", password="p")
+        cls.resumes = {entries: build_synthetic_resume(user, entries) for entries in SECTION_SIZES}
+
+    def run_case(self, template_name, resume):
+        resume = Resume.objects.get(pk=resume.pk)
+        case = {}
+
+        with CaptureQueriesContext(connection) as queries:
+            data, case["sanitize"] = measure(lambda: sanitize_resume_data(resume))
+        case["sanitize"]["queries"] = len(queries) // (REPEAT + 1)
+
+        html_string, case["render_to_string"] = measure(
+            lambda: render_to_string(f"resumes/{template_name}.html", {"resume": data, "profile_image": None})
+        )
+        case["render_to_string"]["bytes"] = len(html_string.encode("utf-8"))
+
+        # Parse the stylesheet outside the timed region, as the registry does once per worker
+        template_registry.get(template_name)
+        job = RenderJob("0" * 64, template_name, html_string, "file:///")
+        pdf, case["write_pdf"] = measure(lambda: render_pdf(job))
+        case["write_pdf"]["bytes"] = len(pdf)
+        return case
+
+    def test_render_stages(self):
+        results = {}
+        for template_name in TEMPLATES:
+            for entries, resume in self.resumes.items():
+                results[f"{template_name}/{entries}"] = self.run_case(template_name, resume)
+
+        report = {
+            "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": REPEAT,
+            "results": results,
+        }
+        OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        OUTPUT_PATH.write_text(json.dumps(report, indent=2))
+
+        if os.environ.get("RENDER_BENCHMARK_UPDATE_BASELINE") == "1":
+            BASELINE_PATH.write_text(json.dumps(report, indent=2))
+            return
+
+        if not BASELINE_PATH.exists():
+            self.skipTest(f"No baseline at {BASELINE_PATH}; rerun with RENDER_BENCHMARK_UPDATE_BASELINE=1")
+
+        baseline = json.loads(BASELINE_PATH.read_text())["results"]
+        regressions = compare_to_baseline(results, baseline)
+        self.assertFalse(regressions, "Render benchmarks regressed:\n" + "\n".join(regressions))
@@ -0,0 +1,80 @@
+# resume_project/db_router.py
+"""
+Read-replica routing.
+
+Reads go to one of the aliases in DATABASE_REPLICAS and writes go to "default".
+Some reads stay on the primary:
+- reads inside a transaction on the primary, so code sees its own uncommitted writes
+- every query of a request that ReplicaRoutingMiddleware pinned to the primary
+
+The middleware pins write requests. After a write the same client keeps reading
+from the primary for REPLICA_STICKY_SECONDS, which covers replication lag so
+owners always see their own edits. Signed-in users are pinned by a cache entry
+keyed on their user id (taken from the access token, so it follows them across
+devices and web processes); anonymous clients get a short-lived cookie instead.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from users.authentication import CookieJWTAuthentication
+
+_pinned_to_primary = contextvars.ContextVar("pinned_to_primary", default=False)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or _pinned_to_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def primary_pin_key(user_id):
+    return f"pin_primary:{user_id}"
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.authentication = CookieJWTAuthentication()
+
+    def __call__(self, request):
+        is_write = request.method not in SAFE_METHODS
+        user_id = self.authentication.get_request_user_id(request)
+        if is_write:
+            pinned = True
+        elif user_id is not None:
+            pinned = cache.get(primary_pin_key(user_id)) is not None
+        else:
+            pinned = settings.REPLICA_PIN_COOKIE in request.COOKIES
+        token = _pinned_to_primary.set(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned_to_primary.reset(token)
+
+        if is_write and response.status_code < 400:
+            if user_id is not None:
+                cache.set(primary_pin_key(user_id), 1, timeout=settings.REPLICA_STICKY_SECONDS)
+            else:
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, "1",
+                    max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax",
+                )
+        return response
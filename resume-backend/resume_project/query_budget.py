@@ -0,0 +1,106 @@
+# resume_project/query_budget.py
+"""
+Per-request SQL instrumentation.
+
+QueryBudgetMiddleware records every statement executed while a request is
+handled: the number of queries, total database time and statements that ran
+more than once (the usual sign of an N+1). Each request is summarised in one
+JSON log line on the "resume_project.query_budget" logger, tagged with the
+resolved URL name. With DEBUG on the numbers are also sent as X-SQL-* response
+headers.
+
+SQL_QUERY_BUDGETS maps URL names to the maximum number of queries a request
+may issue. Going over budget is logged as a warning; tests enforce the budgets
+with QueryBudgetTestMixin.assertWithinQueryBudget.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """execute_wrapper that records the statements run through it."""
+
+    def __init__(self):
+        self.statements = []
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.statements.append(sql)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def duplicates(self):
+        """Statements (ignoring parameters) that ran more than once, with their counts."""
+        return {sql: count for sql, count in Counter(self.statements).items() if count > 1}
+
+    def as_dict(self):
+        return {
+            "queries": self.count,
+            "db_ms": round(self.duration * 1000, 3),
+            "duplicates": sum(count - 1 for count in self.duplicates().values()),
+        }
+
+
+def query_budget(url_name):
+    """The declared query budget for a URL name, or None."""
+    return getattr(settings, "SQL_QUERY_BUDGETS", {}).get(url_name)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        url_name = match.url_name if match else None
+        budget = query_budget(url_name)
+        summary = {"view": url_name, "method": request.method, "status": response.status_code,
+                   **stats.as_dict(), "budget": budget}
+        over_budget = budget is not None and stats.count > budget
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(summary))
+
+        if settings.DEBUG:
+            response["X-SQL-Queries"] = str(summary["queries"])
+            response["X-SQL-Time-Ms"] = str(summary["db_ms"])
+            response["X-SQL-Duplicates"] = str(summary["duplicates"])
+        # Read by QueryBudgetTestMixin through the test client
+        response.sql_stats = stats
+        response.sql_view = url_name
+        return response
+
+
+class QueryBudgetTestMixin:
+    """Test case mixin that fails when a response went over its endpoint's SQL_QUERY_BUDGETS entry."""
+
+    def assertWithinQueryBudget(self, response):
+        budget = query_budget(response.sql_view)
+        self.assertIsNotNone(budget, f"No SQL_QUERY_BUDGETS entry for {response.sql_view!r}")
+        stats = response.sql_stats
+        duplicates = "\n".join(f"  {count}x {sql}" for sql, count in stats.duplicates().items())
+        self.assertLessEqual(
+            stats.count, budget,
+            f"{response.sql_view} ran {stats.count} queries, budget is {budget}"
+            + (f"; repeated statements:\n{duplicates}" if duplicates else ""),
+        )
+        return stats
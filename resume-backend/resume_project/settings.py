@@ -3,6 +3,7 @@ import openai
 from datetime import timedelta
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -79,6 +80,7 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'resume_project.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -87,6 +89,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'resume_project.query_budget.QueryBudgetMiddleware',
 ]
 
 # CORS_ALLOW_ALL_ORIGINS = True
@@ -125,6 +128,11 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'resume_project.query_budget': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -162,6 +170,31 @@ DATABASES = {
     }
 }
 
+# Read replicas (comma separated hosts, same credentials as the primary); see resume_project.db_router
+POSTGRES_REPLICA_HOSTS = [host for host in os.environ.get("POSTGRES_REPLICA_HOSTS", "").split(",") if host]
+DATABASE_REPLICAS = []
+for index, host in enumerate(POSTGRES_REPLICA_HOSTS, start=1):
+    DATABASES[f"replica{index}"] = {**DATABASES["default"], "HOST": host, "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica{index}")
+DATABASE_ROUTERS = ["resume_project.db_router.PrimaryReplicaRouter"]
+
+# After a write, the client reads from the primary for this many seconds. Signed-in
+# users are pinned through the cache, anonymous clients through a cookie.
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+REPLICA_PIN_COOKIE = "pin_primary"
+
+# Shared between web processes, so the pins above hold whichever worker serves the next read
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+elif DATABASE_REPLICAS:
+    # The default per-process cache would let an owner read a stale replica right after a write
+    raise ImproperlyConfigured("POSTGRES_REPLICA_HOSTS requires REDIS_URL for read-your-writes pinning")
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 STATIC_URL = "/static/"
@@ -176,6 +209,60 @@ STATICFILES_FINDERS = [
 
 PASSWORD_RESET_TIMEOUT = 900
 
+# Rendered resume PDFs are cached on disk, keyed by a hash of their content
+PDF_CACHE_DIR = BASE_DIR / "pdf_cache"
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# PDFs are rendered by a separate process pool (0 workers renders inline in the request)
+PDF_RENDER_WORKERS = int(os.environ.get("PDF_RENDER_WORKERS", 2))
+PDF_RENDER_QUEUE_SIZE = int(os.environ.get("PDF_RENDER_QUEUE_SIZE", 16))
+PDF_RENDER_TIMEOUT = int(os.environ.get("PDF_RENDER_TIMEOUT", 30))
+# A job's .pending marker in PDF_CACHE_DIR is trusted by other web processes for this many
+# seconds, so a job lost with its process stops being reported as pending
+PDF_RENDER_PENDING_TTL = int(os.environ.get("PDF_RENDER_PENDING_TTL", 120))
+# A deterministic render failure is not retried for the same resume revision for this many
+# seconds; older .failed and .pending markers are removed when the cache is evicted
+PDF_RENDER_FAILED_TTL = int(os.environ.get("PDF_RENDER_FAILED_TTL", 24 * 60 * 60))
+
+# Render workers are replaced after this many renders or once their RSS passes the limit,
+# and a render running longer than the wall-clock limit (seconds) has its worker killed
+PDF_RENDER_MAX_RENDERS_PER_WORKER = int(os.environ.get("PDF_RENDER_MAX_RENDERS_PER_WORKER", 200))
+PDF_RENDER_MAX_RSS_MB = int(os.environ.get("PDF_RENDER_MAX_RSS_MB", 512))
+PDF_RENDER_WALL_CLOCK_LIMIT = int(os.environ.get("PDF_RENDER_WALL_CLOCK_LIMIT", 20))
+
+# Resume view/download counts are buffered in each process and written in one batch
+# every ANALYTICS_FLUSH_INTERVAL seconds (and at shutdown); 0 only flushes on shutdown
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 5))
+
+# `manage.py rollup_resume_analytics` adds events into the rollups once they were flushed
+# this many seconds ago, and deletes raw view/download events older than the retention
+# window once rolled up. The lag must be longer than ANALYTICS_FLUSH_INTERVAL (and that
+# interval above 0), or hours reported as complete could still receive buffered events.
+ANALYTICS_ROLLUP_LAG = int(os.environ.get("ANALYTICS_ROLLUP_LAG", 300))
+ANALYTICS_EVENT_RETENTION_DAYS = int(os.environ.get("ANALYTICS_EVENT_RETENTION_DAYS", 30))
+
+# Stored PDFs are streamed by Django unless a front-end server delivers them:
+# "x-accel-redirect" (nginx, internal location aliased to PDF_CACHE_DIR) or "x-sendfile"
+PDF_SENDFILE_BACKEND = os.environ.get("PDF_SENDFILE_BACKEND", "")
+PDF_SENDFILE_URL_PREFIX = os.environ.get("PDF_SENDFILE_URL_PREFIX", "/protected-pdfs/")
+
+# Seconds to wait after a resume is published/made public before pre-rendering its PDFs
+PDF_WARMUP_DELAY = int(os.environ.get("PDF_WARMUP_DELAY", 10))
+
+# Gallery thumbnails: first PDF page rasterized with poppler's pdftoppm
+PREVIEW_DIR = MEDIA_ROOT / "previews"
+PREVIEW_WIDTH = int(os.environ.get("PREVIEW_WIDTH", 320))
+PREVIEW_PDFTOPPM = os.environ.get("PREVIEW_PDFTOPPM", "pdftoppm")
+
+# Maximum SQL queries per request, by URL name (see resume_project.query_budget)
+SQL_QUERY_BUDGETS = {
+    'resume-list': 8,
+    'public-resumes': 8,
+    'resume-detail': 5,
+    'user-stats': 4,
+    'resume-timeseries': 5,
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,7 @@
+# resume_project/test_settings.py
+"""Settings for the test suite: the production settings plus what only the tests need."""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# Never routed to unless listed in DATABASE_REPLICAS; gives the routing tests a second alias
+DATABASES["replica"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
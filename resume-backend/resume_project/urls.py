@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from health.views import health_check
+from health.views import health_check, render_metrics_view
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 
 from rest_framework import permissions
@@ -26,6 +26,7 @@ urlpatterns = [
     path('api/', include('resumes.urls')),
     path('api/nlp/', include('nlp.urls')),
     path('api/health/', health_check, name='health-check'), 
+    path('api/health/render/', render_metrics_view, name='render-metrics'),
 
     # Swagger/OpenAPI endpoints
     re_path(r'^swagger(?P<format>\.json|\.yaml)$',
@@ -0,0 +1,220 @@
+# resumes/analytics.py
+"""
+Time-series analytics for resumes.
+
+Every counted view and download is appended to ResumeEvent by the counter
+buffer (resumes.counters) when it flushes. `rollup_events()` adds new events into
+hourly and daily ResumeAnalyticsRollup rows. Its watermark is the ResumeEvent id,
+i.e. insertion order, not the time a hit occurred: a process may flush hits long
+after they happened (ANALYTICS_FLUSH_INTERVAL=0 only flushes at shutdown), and
+those late events are still added to their hours when they arrive. Events are only
+taken once they were recorded ANALYTICS_ROLLUP_LAG seconds ago, so every lower id
+has committed. The watermark's `position` is the time before which buckets are
+complete, the lag minus one flush interval behind.
+
+`compact_events()` deletes raw events older than ANALYTICS_EVENT_RETENTION_DAYS
+that the watermark has passed. Time series are answered from the rollups only.
+Both jobs run from `manage.py rollup_resume_analytics`.
+
+Unique viewers are estimated from ResumeViewerSketch, one fixed-size HyperLogLog
+sketch per resume and UTC day. A range is answered by merging its days' sketches.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .counters import COUNTER_FIELDS, add_counts
+from .enums import AnalyticsEventType, RollupGranularity
+from .hll import HyperLogLog
+from .models import ResumeAnalyticsRollup, ResumeEvent, ResumeViewerSketch, RollupWatermark
+
+ROLLUP_WATERMARK = "resume_events"
+BUCKET_STEPS = {
+    RollupGranularity.HOUR: datetime.timedelta(hours=1),
+    RollupGranularity.DAY: datetime.timedelta(days=1),
+}
+# Upper bound on the number of buckets one time-series request may ask for
+MAX_TIMESERIES_BUCKETS = 1000
+# Event ids added into the rollups per transaction
+ROLLUP_BATCH_SIZE = 50000
+COMPACTION_BATCH_SIZE = 5000
+
+
+def floor_bucket(value, granularity):
+    value = value.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == RollupGranularity.DAY:
+        value = value.replace(hour=0)
+    return value
+
+
+def rollup_position():
+    watermark = RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).first()
+    return watermark.position if watermark else None
+
+
+def check_rollup_settings():
+    interval = settings.ANALYTICS_FLUSH_INTERVAL
+    if interval <= 0 or settings.ANALYTICS_ROLLUP_LAG <= interval:
+        # With 0 counters are only flushed at shutdown, so no lag covers the buffered hits
+        raise ImproperlyConfigured(
+            "Rolling up analytics needs ANALYTICS_FLUSH_INTERVAL > 0 and ANALYTICS_ROLLUP_LAG greater than it "
+            f"(got {interval} and {settings.ANALYTICS_ROLLUP_LAG})"
+        )
+
+
+def rollup_batch(after_id, last_id):
+    """Add the events with ids in (after_id, last_id] to their hourly and daily rollups."""
+    hourly = (
+        ResumeEvent.objects.filter(pk__gt=after_id, pk__lte=last_id)
+        .annotate(hour=TruncHour("occurred_at", tzinfo=datetime.timezone.utc))
+        .values("resume_id", "hour")
+        .annotate(
+            views=Count("pk", filter=Q(event_type=AnalyticsEventType.VIEW)),
+            downloads=Count("pk", filter=Q(event_type=AnalyticsEventType.DOWNLOAD)),
+        )
+        .order_by()
+    )
+    totals = {RollupGranularity.HOUR: {}, RollupGranularity.DAY: defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))}
+    for row in hourly:
+        totals[RollupGranularity.HOUR][(row["resume_id"], row["hour"])] = row
+        day = totals[RollupGranularity.DAY][(row["resume_id"], floor_bucket(row["hour"], RollupGranularity.DAY))]
+        for field in COUNTER_FIELDS:
+            day[field] += row[field]
+
+    for granularity, counts in totals.items():
+        # Rows are created empty and added to, so later batches for the same bucket add up
+        ResumeAnalyticsRollup.objects.bulk_create(
+            [ResumeAnalyticsRollup(resume_id=resume_id, granularity=granularity, bucket=bucket)
+             for resume_id, bucket in counts],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        add_counts(ResumeAnalyticsRollup, ("resume_id", "bucket"), counts, granularity=granularity)
+
+
+def rollup_events(now=None):
+    """Add every event recorded before the lag into the rollups; returns the new position."""
+    check_rollup_settings()
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG)
+    complete = floor_bucket(cutoff - datetime.timedelta(seconds=settings.ANALYTICS_FLUSH_INTERVAL),
+                            RollupGranularity.HOUR)
+    watermark, _ = RollupWatermark.objects.get_or_create(name=ROLLUP_WATERMARK, defaults={"position": complete})
+    last_id = ResumeEvent.objects.filter(
+        pk__gt=watermark.last_event_id, recorded_at__lte=cutoff,
+    ).aggregate(last_id=Max("pk"))["last_id"] or watermark.last_event_id
+
+    while True:
+        # One transaction per batch; the row lock keeps concurrent runs from adding events twice
+        with transaction.atomic():
+            watermark = RollupWatermark.objects.select_for_update().get(name=ROLLUP_WATERMARK)
+            after_id = watermark.last_event_id
+            stop = min(after_id + ROLLUP_BATCH_SIZE, last_id)
+            if stop > after_id:
+                rollup_batch(after_id, stop)
+                watermark.last_event_id = stop
+            if stop >= last_id:
+                watermark.position = max(watermark.position, complete)
+            watermark.save(update_fields=["last_event_id", "position"])
+        if stop >= last_id:
+            return watermark.position
+
+
+def compact_events(now=None, retention_days=None):
+    """Delete raw events past the retention window that are already rolled up; returns how many."""
+    now = now or timezone.now()
+    if retention_days is None:
+        retention_days = settings.ANALYTICS_EVENT_RETENTION_DAYS
+    watermark = RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).first()
+    if watermark is None:
+        return 0
+    cutoff = now - datetime.timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        pks = list(ResumeEvent.objects.filter(pk__lte=watermark.last_event_id, occurred_at__lt=cutoff)
+                   .values_list("pk", flat=True)[:COMPACTION_BATCH_SIZE])
+        if not pks:
+            return deleted
+        deleted += ResumeEvent.objects.filter(pk__in=pks).delete()[0]
+
+
+def parse_bucket_time(value):
+    """An ISO date or datetime query parameter as an aware datetime; raises ValueError."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.datetime.combine(date, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+    return parsed
+
+
+def resume_timeseries(resume_id, granularity, start, end):
+    """
+    Views and downloads of a resume per bucket in [start, end), read from the rollups.
+    Buckets without activity are returned with zero counts.
+    """
+    step = BUCKET_STEPS[granularity]
+    start = floor_bucket(start, granularity)
+    if (end - start) / step > MAX_TIMESERIES_BUCKETS:
+        raise ValueError(f"Ranges are limited to {MAX_TIMESERIES_BUCKETS} buckets")
+    rollups = {
+        row["bucket"]: row
+        for row in ResumeAnalyticsRollup.objects.filter(
+            resume_id=resume_id, granularity=granularity, bucket__gte=start, bucket__lt=end,
+        ).values("bucket", "views", "downloads")
+    }
+    series = []
+    bucket = start
+    while bucket < end:
+        row = rollups.get(bucket, {})
+        series.append({"bucket": bucket, "views": row.get("views", 0), "downloads": row.get("downloads", 0)})
+        bucket += step
+    return series
+
+
+def merge_viewer_sketches(sketches):
+    """Fold buffered {(resume_id, day): HyperLogLog} into the stored sketches; call inside a transaction."""
+    if not sketches:
+        return
+    resume_ids = {resume_id for resume_id, _ in sketches}
+    days = {day for _, day in sketches}
+    # Create missing rows first so that every merge below happens under a row lock
+    ResumeViewerSketch.objects.bulk_create(
+        [ResumeViewerSketch(resume_id=resume_id, day=day, registers=HyperLogLog().to_bytes())
+         for resume_id, day in sketches],
+        ignore_conflicts=True,
+    )
+    stored = [
+        row for row in ResumeViewerSketch.objects.select_for_update()
+        .filter(resume_id__in=resume_ids, day__in=days).order_by("resume_id", "day")
+        if (row.resume_id, row.day) in sketches
+    ]
+    for row in stored:
+        row.registers = HyperLogLog.from_bytes(row.registers).merge(sketches[(row.resume_id, row.day)]).to_bytes()
+    ResumeViewerSketch.objects.bulk_update(stored, ["registers"], batch_size=200)
+
+
+def unique_viewers(resume_id, start_day, end_day):
+    """
+    Estimated distinct viewers of a resume on the days in [start_day, end_day):
+    returns (the estimate for the whole range, {day: estimate} for days with views).
+    """
+    total = HyperLogLog()
+    per_day = {}
+    for day, registers in ResumeViewerSketch.objects.filter(
+        resume_id=resume_id, day__gte=start_day, day__lt=end_day,
+    ).values_list("day", "registers"):
+        sketch = HyperLogLog.from_bytes(registers)
+        per_day[day] = sketch.count()
+        total.merge(sketch)
+    return total.count(), per_day
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ResumesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resumes'
+
+    def ready(self):
+        # Load vendored PDF assets once per process so renders never hit the disk or network for them
+        from .asset_fetcher import asset_store
+        asset_store.load()
@@ -0,0 +1,112 @@
+# resumes/asset_fetcher.py
+"""
+Offline url_fetcher for the WeasyPrint PDF pipeline.
+
+Every file under resumes/static/resumes/ (vendored Font Awesome CSS and fonts) is
+read into memory once per process. WeasyPrint asks the fetcher for stylesheets,
+fonts and images referenced by the rendered HTML; these are answered from memory,
+known CDN URLs are mapped onto their vendored copies, and any other remote URL is
+refused, so renders never touch the network.
+
+The templates also <link> their own resumes/css/template_*.css for the HTML view.
+PDF renders get that stylesheet pre-parsed from the template registry, so the
+fetcher answers those links with an empty stylesheet instead of a second copy.
+"""
+import mimetypes
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, unquote
+
+from django.conf import settings
+
+STATIC_ROOT_DIR = Path(__file__).resolve().parent / "static"
+ASSET_PREFIX = "resumes/"
+# Template stylesheets, applied by resumes.template_registry rather than fetched
+TEMPLATE_STYLESHEET_PREFIX = "resumes/css/template_"
+
+# Remote URL prefixes that templates link to, mapped onto vendored static paths
+REMOTE_ASSET_ALIASES = {
+    "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/": "resumes/vendor/fontawesome-5.15.4/",
+}
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("font/woff", ".woff")
+
+
+class RemoteAssetBlocked(ValueError):
+    """Raised for URLs that would require a network fetch."""
+
+
+class AssetStore:
+    def __init__(self, root=STATIC_ROOT_DIR, prefix=ASSET_PREFIX):
+        self.root = Path(root)
+        self.prefix = prefix
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read every asset into memory; called at app startup and on first use."""
+        assets = {}
+        for path in (self.root / self.prefix).rglob("*"):
+            relative = path.relative_to(self.root).as_posix()
+            if path.is_file() and not relative.startswith(TEMPLATE_STYLESHEET_PREFIX):
+                mime_type, _ = mimetypes.guess_type(path.name)
+                assets[relative] = (path.read_bytes(), mime_type or "application/octet-stream")
+        with self._lock:
+            self._assets = assets
+        return self
+
+    def get(self, static_path):
+        if self._assets is None:
+            self.load()
+        return self._assets.get(static_path)
+
+    def __len__(self):
+        if self._assets is None:
+            self.load()
+        return len(self._assets)
+
+    def resolve(self, url):
+        """Map a URL to a static path like "resumes/css/template_classic.css", or None."""
+        for remote_prefix, static_prefix in REMOTE_ASSET_ALIASES.items():
+            if url.startswith(remote_prefix):
+                return static_prefix + urlsplit(url[len(remote_prefix):]).path
+
+        parts = urlsplit(url)
+        if parts.scheme != "file":
+            return None
+
+        # "{% static %}" links resolve against base_url to file:///static/..., direct paths point into the app
+        path = unquote(parts.path)
+        for marker in (f"{settings.STATIC_URL.rstrip('/')}/{self.prefix}", f"/static/{self.prefix}"):
+            index = path.find(marker)
+            if index != -1:
+                return self.prefix + path[index + len(marker):]
+        return None
+
+    def fetch(self, url, timeout=10, ssl_context=None):
+        """WeasyPrint url_fetcher interface."""
+        if url.startswith("data:"):
+            from weasyprint import default_url_fetcher
+
+            return default_url_fetcher(url, timeout=timeout, ssl_context=ssl_context)
+
+        static_path = self.resolve(url)
+        if static_path and static_path.startswith(TEMPLATE_STYLESHEET_PREFIX):
+            return {"string": b"", "mime_type": "text/css", "encoding": "utf-8", "redirected_url": url}
+        asset = self.get(static_path) if static_path else None
+        if asset is None:
+            raise RemoteAssetBlocked(f"Asset not available offline: {url}")
+
+        content, mime_type = asset
+        result = {"string": content, "mime_type": mime_type, "redirected_url": url}
+        if mime_type.startswith("text/"):
+            result["encoding"] = "utf-8"
+        return result
+
+
+asset_store = AssetStore()
+
+
+def asset_fetcher(url, timeout=10, ssl_context=None):
+    return asset_store.fetch(url, timeout=timeout, ssl_context=ssl_context)
@@ -0,0 +1,169 @@
+# resumes/counters.py
+"""
+Buffered view and download counters.
+
+The request path only increments an in-process buffer. A background thread
+flushes it every ANALYTICS_FLUSH_INTERVAL seconds, applying all pending counts in
+one batched UPDATE ... SET views = views + CASE ... per chunk of resumes. The
+buffer is also flushed at interpreter exit, so a worker shutting down gracefully
+loses nothing. Additions are applied with F() expressions, so several processes
+can flush concurrently and every hit is still counted exactly once. The same
+transaction advances each owner's UserStats totals.
+
+Each hit is also kept with its timestamp and appended to the ResumeEvent log in
+the same flush, for the time-series rollups in resumes.analytics. Views that
+name a viewer fingerprint also go into an in-memory HyperLogLog sketch per resume
+and day, which the flush merges into ResumeViewerSketch.
+"""
+import atexit
+import functools
+import logging
+import operator
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from .enums import AnalyticsEventType
+from .hll import HyperLogLog
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("views", "downloads")
+COUNTER_EVENT_TYPES = {"views": AnalyticsEventType.VIEW, "downloads": AnalyticsEventType.DOWNLOAD}
+FLUSH_CHUNK_SIZE = 500
+
+
+def add_counts(model, key, totals, **filters):
+    """
+    Add {key value: {field: amount}} to `model` rows with one UPDATE per FLUSH_CHUNK_SIZE keys.
+    `key` is a field name, or a tuple of field names with tuple key values; `filters` narrow the rows further.
+    """
+    keys = list(totals)
+    for start in range(0, len(keys), FLUSH_CHUNK_SIZE):
+        chunk = keys[start:start + FLUSH_CHUNK_SIZE]
+        if isinstance(key, tuple):
+            matches = {value: models.Q(**dict(zip(key, value))) for value in chunk}
+            rows = model.objects.filter(functools.reduce(operator.or_, matches.values()), **filters)
+        else:
+            matches = {value: models.Q(**{key: value}) for value in chunk}
+            rows = model.objects.filter(**{f"{key}__in": chunk}, **filters)
+        updates = {}
+        for field in COUNTER_FIELDS:
+            whens = [models.When(matches[value], then=models.Value(totals[value][field]))
+                     for value in chunk if totals[value][field]]
+            if whens:
+                updates[field] = models.F(field) + models.Case(
+                    *whens, default=models.Value(0), output_field=models.PositiveIntegerField(),
+                )
+        if updates:
+            rows.update(**updates)
+
+
+class CounterBuffer:
+    def __init__(self):
+        self._pending = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+        self._events = []
+        self._sketches = defaultdict(HyperLogLog)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def increment(self, resume_id, field, amount=1, viewer=None):
+        """Count `amount` hits; `viewer` is a fingerprint added to the resume's unique-viewer sketch for today."""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f"Unknown counter: {field}")
+        occurred_at = timezone.now()
+        with self._lock:
+            self._pending[resume_id][field] += amount
+            self._events.extend([(resume_id, COUNTER_EVENT_TYPES[field], occurred_at)] * amount)
+            if viewer is not None:
+                self._sketches[(resume_id, occurred_at.date())].add(viewer)
+        self._ensure_flusher()
+
+    def pending(self):
+        with self._lock:
+            return {resume_id: dict(counts) for resume_id, counts in self._pending.items()}
+
+    def flush(self):
+        """Write all buffered counts to ResumeAnalytics; counts are put back if the write fails."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+                events, self._events = self._events, []
+                sketches, self._sketches = self._sketches, defaultdict(HyperLogLog)
+            if not batch:
+                return 0
+            try:
+                self._write(batch, events, sketches)
+            except Exception:
+                with self._lock:
+                    for resume_id, counts in batch.items():
+                        for field, amount in counts.items():
+                            self._pending[resume_id][field] += amount
+                    self._events[:0] = events
+                    for key, sketch in sketches.items():
+                        self._sketches[key].merge(sketch)
+                raise
+            return len(batch)
+
+    def _write(self, batch, events, sketches):
+        from .analytics import merge_viewer_sketches
+        from .models import Resume, ResumeAnalytics, ResumeEvent, UserStats
+
+        with transaction.atomic():
+            # Resumes deleted since the hit are skipped. Those created before analytics rows
+            # existed still need one to count into.
+            owners = dict(Resume.objects.filter(pk__in=list(batch)).values_list("pk", "user_id"))
+            ResumeAnalytics.objects.bulk_create(
+                [ResumeAnalytics(resume_id=resume_id) for resume_id in owners], ignore_conflicts=True,
+            )
+            ResumeEvent.objects.bulk_create(
+                [ResumeEvent(resume_id=resume_id, event_type=event_type, occurred_at=occurred_at)
+                 for resume_id, event_type, occurred_at in events if resume_id in owners],
+                batch_size=1000,
+            )
+            add_counts(ResumeAnalytics, "resume_id", {resume_id: batch[resume_id] for resume_id in owners})
+            merge_viewer_sketches({key: sketch for key, sketch in sketches.items() if key[0] in owners})
+
+            per_user = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+            for resume_id, user_id in owners.items():
+                if user_id is not None:
+                    for field in COUNTER_FIELDS:
+                        per_user[user_id][field] += batch[resume_id][field]
+            UserStats.objects.bulk_create([UserStats(user_id=user_id) for user_id in per_user], ignore_conflicts=True)
+            add_counts(UserStats, "user_id", per_user)
+
+    def _ensure_flusher(self):
+        interval = settings.ANALYTICS_FLUSH_INTERVAL
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, args=(interval,), name="analytics-flusher", daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing analytics counters failed; will retry")
+            finally:
+                close_old_connections()
+
+    def shutdown(self):
+        self._stopped.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final analytics counter flush failed")
+
+
+resume_counters = CounterBuffer()
+atexit.register(resume_counters.shutdown)
@@ -0,0 +1,108 @@
+# resumes/documents.py
+"""
+Materialized resume documents.
+
+A resume is stored across seven tables, but it is read far more often than it is
+written. Each resume therefore gets a ResumeDocument row holding three
+pre-assembled projections:
+
+- "owner": sanitize_resume_data(resume), as used by the HTML and PDF templates
+- "anonymized": sanitize_resume_data(resume, is_anonymized=True)
+- "api": the nested sections exactly as ResumeSerializer outputs them
+
+ResumeSerializer refreshes the document inside the transaction of every write.
+Read paths call get_resume_document(), which also rebuilds a missing document or
+one older than its resume (a different revision, or the resume row was saved
+afterwards, e.g. from the admin). `manage.py rebuild_resume_documents` rebuilds all
+of them in batches.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+
+from .models import RESUME_SECTION_RELATIONS, Resume, ResumeDocument, PersonalDetails
+
+# Nested ResumeSerializer fields served from the "api" projection
+API_DOCUMENT_FIELDS = ('personal_details', 'education', 'work_experience', 'projects', 'skills', 'awards')
+DATE_KEYS = ('start_date', 'end_date')
+
+
+def to_json(data):
+    """Dates and decimals become ISO strings, as they would in an API response."""
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def build_api_projection(resume):
+    from .serializers import ResumeSerializer
+
+    fields = ResumeSerializer().fields
+    projection = {}
+    for name in API_DOCUMENT_FIELDS:
+        attribute = fields[name].get_attribute(resume)
+        projection[name] = None if attribute is None else fields[name].to_representation(attribute)
+    return to_json(projection)
+
+
+def build_template_projection(resume, is_anonymized):
+    from .serializers import sanitize_resume_data
+
+    try:
+        return to_json(sanitize_resume_data(resume, is_anonymized=is_anonymized))
+    except PersonalDetails.DoesNotExist:
+        # Drafts may not have personal details yet; reads fall back to sanitize_resume_data
+        return None
+
+
+def build_resume_document(resume):
+    """An unsaved ResumeDocument for `resume`, which should have its sections prefetched."""
+    return ResumeDocument(
+        resume=resume,
+        revision=resume.revision,
+        owner=build_template_projection(resume, is_anonymized=False),
+        anonymized=build_template_projection(resume, is_anonymized=True),
+        api=build_api_projection(resume),
+    )
+
+
+def refresh_resume_document(resume):
+    """Rebuild and store the document from the database state; call inside the writing transaction."""
+    fresh = Resume.objects.select_related('personal_details').prefetch_related(
+        *RESUME_SECTION_RELATIONS,
+    ).get(pk=resume.pk)
+    document = build_resume_document(fresh)
+    document.save()
+    resume.document = document
+    return document
+
+
+def get_resume_document(resume):
+    """The resume's up-to-date ResumeDocument, rebuilding it if it is missing or stale."""
+    try:
+        document = resume.document
+    except ResumeDocument.DoesNotExist:
+        document = None
+    if document is None or document.revision != resume.revision or document.updated_at < resume.updated_at:
+        document = refresh_resume_document(resume)
+    return document
+
+
+def restore_dates(data):
+    """Turn the ISO date strings of a template projection back into dates for the |date filter."""
+    for section in ('education', 'work_experience', 'projects'):
+        for item in data.get(section, []):
+            for key in DATE_KEYS:
+                if isinstance(item.get(key), str):
+                    item[key] = parse_date(item[key])
+    return data
+
+
+def resume_template_data(resume, is_anonymized=False):
+    """Drop-in replacement for sanitize_resume_data() that reads the materialized document."""
+    document = get_resume_document(resume)
+    data = document.anonymized if is_anonymized else document.owner
+    if data is None:
+        from .serializers import sanitize_resume_data
+
+        return sanitize_resume_data(resume, is_anonymized=is_anonymized)
+    return restore_dates(data)
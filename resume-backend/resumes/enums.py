@@ -24,3 +24,17 @@ class SkillType(models.TextChoices):
     LANGUAGE = "LANGUAGE", "Language"
     TECHNICAL = "TECHNICAL", "Technical"
 
+
+class AnalyticsEventType(models.TextChoices):
+    """
+    Enumeration for recorded resume analytics events.
+    """
+    VIEW = "VIEW", "View"
+    DOWNLOAD = "DOWNLOAD", "Download"
+
+class RollupGranularity(models.TextChoices):
+    """
+    Enumeration for analytics rollup bucket sizes.
+    """
+    HOUR = "HOUR", "Hour"
+    DAY = "DAY", "Day"
@@ -0,0 +1,55 @@
+# resumes/hll.py
+"""
+HyperLogLog cardinality sketches.
+
+A sketch is a fixed array of 2**PRECISION one-byte registers (4 KiB), whatever the
+number of values added. Each value is hashed to 64 bits: the first PRECISION bits
+pick a register and the register keeps the longest run of leading zeros seen in the
+remaining bits. Sketches merge by taking the register-wise maximum, so per-day
+sketches combine into a range without losing accuracy. The standard error is about
+1.04 / sqrt(2**PRECISION), i.e. 1.6%.
+"""
+import hashlib
+import math
+
+PRECISION = 12
+REGISTER_COUNT = 1 << PRECISION
+HASH_BITS = 64
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTER_COUNT)
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(HASH_BITS - PRECISION + 2)]
+
+
+class HyperLogLog:
+    def __init__(self, registers=None):
+        self.registers = bytearray(REGISTER_COUNT if registers is None else registers)
+        if len(self.registers) != REGISTER_COUNT:
+            raise ValueError(f"A sketch has {REGISTER_COUNT} registers, got {len(self.registers)}")
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(bytes(data))
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=HASH_BITS // 8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (HASH_BITS - PRECISION)
+        remainder = hashed & ((1 << (HASH_BITS - PRECISION)) - 1)
+        rank = HASH_BITS - PRECISION - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Fold `other` into this sketch; returns self."""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        estimate = _ALPHA * REGISTER_COUNT ** 2 / sum(_INVERSE_POWERS[rank] for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTER_COUNT and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = REGISTER_COUNT * math.log(REGISTER_COUNT / zeros)
+        return round(estimate)
@@ -0,0 +1,31 @@
+# resumes/management/commands/rebuild_resume_documents.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from resumes.documents import build_resume_document
+from resumes.models import RESUME_SECTION_RELATIONS, Resume, ResumeDocument
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized ResumeDocument of every resume, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="Resumes loaded and written per transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        resumes = Resume.objects.select_related("personal_details").prefetch_related(*RESUME_SECTION_RELATIONS)
+        pks = list(Resume.objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = resumes.filter(pk__in=pks[start:start + batch_size])
+            documents = [build_resume_document(resume) for resume in batch]
+            with transaction.atomic():
+                ResumeDocument.objects.bulk_create(
+                    documents,
+                    update_conflicts=True,
+                    unique_fields=["resume"],
+                    update_fields=["revision", "owner", "anonymized", "api", "updated_at"],
+                )
+            self.stdout.write(f"Rebuilt {min(start + batch_size, len(pks))}/{len(pks)} resume documents")
+        self.stdout.write(self.style.SUCCESS(f"✔ Rebuilt {len(pks)} resume documents"))
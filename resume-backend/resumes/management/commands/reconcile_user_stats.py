@@ -0,0 +1,25 @@
+# resumes/management/commands/reconcile_user_stats.py
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from resumes.user_stats import reconcile_favorite_counts, reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = ("Recomputes every user's UserStats totals from ResumeAnalytics and Favorite, "
+            "and their resumes' favorite counts, in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Users recomputed per transaction")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pks = list(get_user_model().objects.order_by("pk").values_list("pk", flat=True))
+        for start in range(0, len(pks), batch_size):
+            with transaction.atomic():
+                reconcile_user_stats(pks[start:start + batch_size])
+                reconcile_favorite_counts(pks[start:start + batch_size])
+            self.stdout.write(f"Reconciled {min(start + batch_size, len(pks))}/{len(pks)} users")
+        self.stdout.write(self.style.SUCCESS(f"✔ Reconciled stats of {len(pks)} users"))
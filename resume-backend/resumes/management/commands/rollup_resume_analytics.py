@@ -0,0 +1,22 @@
+# resumes/management/commands/rollup_resume_analytics.py
+
+from django.core.management.base import BaseCommand
+
+from resumes.analytics import compact_events, rollup_events
+
+
+class Command(BaseCommand):
+    help = "Aggregates resume view/download events into hourly and daily rollups and compacts old events."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retention-days", type=int, default=None,
+                            help="Keep raw events this many days (default ANALYTICS_EVENT_RETENTION_DAYS)")
+        parser.add_argument("--skip-compaction", action="store_true", help="Only roll up, keep all raw events")
+
+    def handle(self, *args, **options):
+        position = rollup_events()
+        self.stdout.write(f"Rolled up events before {position.isoformat()}")
+        if not options["skip_compaction"]:
+            deleted = compact_events(retention_days=options["retention_days"])
+            self.stdout.write(f"Deleted {deleted} raw events")
+        self.stdout.write(self.style.SUCCESS("✔ Resume analytics rolled up"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0029_project_currently_working_project_end_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
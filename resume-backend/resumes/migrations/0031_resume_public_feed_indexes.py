@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0030_resume_revision'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['privacy_setting', 'created_at', 'id'], name='resume_public_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['privacy_setting', 'updated_at', 'id'], name='resume_public_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['privacy_setting', 'title', 'id'], name='resume_public_title_idx'),
+        ),
+    ]
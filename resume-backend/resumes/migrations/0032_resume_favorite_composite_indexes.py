@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0031_resume_public_feed_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['resume', 'user'], name='favorite_resume_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resume',
+            index=models.Index(fields=['user', 'created_at'], name='resume_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0032_resume_favorite_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeDocument',
+            fields=[
+                ('resume', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='resumes.resume')),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('owner', models.JSONField(null=True)),
+                ('anonymized', models.JSONField(null=True)),
+                ('api', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0033_resumedocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.DateTimeField()),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('event_type', models.CharField(choices=[('VIEW', 'View'), ('DOWNLOAD', 'Download')], max_length=10)),
+                ('occurred_at', models.DateTimeField(db_index=True)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='resumes.resume')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumeAnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_rollups', to='resumes.resume')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resume', 'granularity', 'bucket'), name='unique_resume_rollup_bucket')],
+            },
+        ),
+    ]
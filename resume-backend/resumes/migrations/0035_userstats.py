@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from resumes.user_stats import reconcile_user_stats
+
+
+def populate_user_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    pks = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), 500):
+        reconcile_user_stats(pks[start:start + 500], apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0034_resume_analytics_timeseries'),
+        ('users', '0006_delete_guestuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('favorites', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0035_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeViewerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('resume', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='viewer_sketches', to='resumes.resume')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resume', 'day'), name='unique_resume_viewer_sketch_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+from resumes.user_stats import reconcile_favorite_counts
+
+
+def populate_favorite_counts(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    pks = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(pks), 500):
+        reconcile_favorite_counts(pks[start:start + 500], apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0036_resumeviewersketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_favorite_counts, migrations.RunPython.noop),
+    ]
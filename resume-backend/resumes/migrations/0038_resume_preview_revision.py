@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resumes', '0037_resume_favorite_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='preview_revision',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -1,14 +1,51 @@
 import datetime
 from django.db import models, migrations
 from django.core.validators import URLValidator
-from django.db.models.signals import post_save
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from users.models import User
-from .enums import ResumeStatus, PrivacySettings, SkillType
+from .enums import ResumeStatus, PrivacySettings, SkillType, AnalyticsEventType, RollupGranularity
 
 User = get_user_model()
 
+# Nested relations rendered by ResumeSerializer
+RESUME_SECTION_RELATIONS = ('education', 'work_experience', 'projects', 'skills', 'awards')
+
+
+class ResumeQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Load everything ResumeSerializer reads in a constant number of queries:
+        one joined query for the single-valued relations plus one per nested section.
+        """
+        return self.select_related('user', 'personal_details', 'analytics').prefetch_related(
+            *RESUME_SECTION_RELATIONS,
+        )
+
+    def with_section_flags(self):
+        """Annotate `has_<relation>` booleans for personal details and every nested section."""
+        return self.annotate(**{
+            f'has_{name}': models.Exists(
+                Resume._meta.get_field(name).related_model.objects.filter(resume=models.OuterRef('pk'))
+            )
+            for name in ('personal_details', *RESUME_SECTION_RELATIONS)
+        })
+
+    def with_favorites(self, user):
+        """
+        For authenticated users, annotate `is_favorited_by_user` as a correlated subquery, so
+        serializing a page needs no per-resume favorite queries. Counts are in Resume.favorite_count.
+        """
+        if user is not None and user.is_authenticated:
+            return self.annotate(is_favorited_by_user=models.Exists(
+                Favorite.objects.filter(resume=models.OuterRef('pk'), user=user)
+            ))
+        return self
+
+
 class Resume(models.Model):
     """
     Represents a Resume linked to a User
@@ -21,13 +58,39 @@ class Resume(models.Model):
     privacy_setting = models.CharField(max_length=10, choices=PrivacySettings.choices, default=PrivacySettings.PRIVATE)
     template = models.CharField(max_length=50, default="template_classic")
     is_anonymized = models.BooleanField(default=False)
+    # Incremented on every write through ResumeSerializer; used for ETags
+    revision = models.PositiveIntegerField(default=0)
+    # Number of Favorite rows, kept by the Favorite signals below
+    favorite_count = models.PositiveIntegerField(default=0)
+    # Newest revision with a stored gallery preview, set by resumes.previews.generate_preview
+    preview_revision = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = ResumeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
-        
+        indexes = [
+            # Public feed keyset pagination (see resumes.pagination), one per cursor ordering
+            models.Index(fields=['privacy_setting', 'created_at', 'id'], name='resume_public_created_idx'),
+            models.Index(fields=['privacy_setting', 'updated_at', 'id'], name='resume_public_updated_idx'),
+            models.Index(fields=['privacy_setting', 'title', 'id'], name='resume_public_title_idx'),
+            # "My resumes" list, newest first
+            models.Index(fields=['user', 'created_at'], name='resume_user_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def section_flags(self):
+        """Which sections this resume has rows for, as {'has_education': True, ...}, in one query."""
+        names = ['has_personal_details', *(f'has_{name}' for name in RESUME_SECTION_RELATIONS)]
+        return Resume.objects.filter(pk=self.pk).with_section_flags().values(*names).get()
+
+    def bump_revision(self):
+        """Atomically increment the revision (and updated_at) and reload both onto this instance."""
+        Resume.objects.filter(pk=self.pk).update(revision=models.F('revision') + 1, updated_at=timezone.now())
+        self.refresh_from_db(fields=['revision', 'updated_at'])
+
 class PersonalDetails(models.Model):
     resume = models.OneToOneField(Resume, on_delete=models.CASCADE, related_name="personal_details", primary_key=True)
     first_name = models.CharField(max_length=100)
@@ -131,6 +194,8 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ("user", "resume")
+        # Per-resume favorite lookups and counts; the unique constraint leads with user
+        indexes = [models.Index(fields=["resume", "user"], name="favorite_resume_user_idx")]
         verbose_name = "Favorite"
         verbose_name_plural = "Favorites"
 
@@ -148,12 +213,104 @@ class ResumeAnalytics(models.Model):
 
     def __str__(self):
         return f"Analytics for {self.resume.title}"
+
+
+class UserStats(models.Model):
+    """
+    Dashboard totals over all of a user's resumes, kept up to date incrementally: views and
+    downloads by resumes.counters, favorites (by other users) by the Favorite signals below.
+    `manage.py reconcile_user_stats` recomputes them from ResumeAnalytics and Favorite.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats', primary_key=True)
+    views = models.PositiveIntegerField(default=0)
+    downloads = models.PositiveIntegerField(default=0)
+    favorites = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.user_id}"
+
+
+class ResumeEvent(models.Model):
+    """Append-only log of views and downloads, written in batches by resumes.counters."""
+    id = models.BigAutoField(primary_key=True)
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='events')
+    event_type = models.CharField(max_length=10, choices=AnalyticsEventType.choices)
+    occurred_at = models.DateTimeField(db_index=True)
+    # When the flush inserted the row; ids allocated before a rollup's cutoff are committed by then
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.event_type} of {self.resume_id} at {self.occurred_at}"
+
+
+class ResumeViewerSketch(models.Model):
+    """HyperLogLog sketch (resumes.hll) of the distinct viewers of a resume on one UTC day."""
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='viewer_sketches')
+    day = models.DateField()
+    # Always REGISTER_COUNT bytes, however many viewers were added
+    registers = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['resume', 'day'], name='unique_resume_viewer_sketch_day'),
+        ]
+
+    def __str__(self):
+        return f"Viewer sketch of {self.resume_id} on {self.day}"
+
+
+class ResumeAnalyticsRollup(models.Model):
+    """Views and downloads of a resume per hour or per day, aggregated from ResumeEvent by resumes.analytics."""
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='analytics_rollups')
+    granularity = models.CharField(max_length=4, choices=RollupGranularity.choices)
+    # Start of the bucket (UTC)
+    bucket = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    downloads = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Time-series reads are range scans on this constraint's index
+        constraints = [
+            models.UniqueConstraint(fields=['resume', 'granularity', 'bucket'], name='unique_resume_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} rollup of {self.resume_id} at {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Events with ids up to `last_event_id` have been added into ResumeAnalyticsRollup;
+    buckets before `position` are complete.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.DateTimeField()
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} rolled up to {self.position}"
         
 
+class ResumeDocument(models.Model):
+    """Denormalized projections of a resume for read paths; maintained by resumes.documents."""
+    resume = models.OneToOneField(Resume, on_delete=models.CASCADE, related_name='document', primary_key=True)
+    # Resume.revision the projections were built from
+    revision = models.PositiveIntegerField(default=0)
+    owner = models.JSONField(null=True)
+    anonymized = models.JSONField(null=True)
+    api = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Document for {self.resume_id} (revision {self.revision})"
+
+
 # Add signals to auto-create analytics
 @receiver(post_save, sender=Resume)
-def create_resume_analytics(sender, instance, **kwargs):
-    ResumeAnalytics.objects.get_or_create(resume=instance)
+def create_resume_analytics(sender, instance, created, raw=False, **kwargs):
+    # Only new resumes need a row; updates used to pay a SELECT here on every save
+    if created and not raw:
+        ResumeAnalytics.objects.create(resume=instance)
 
 def create_missing_analytics(apps, schema_editor):
     Resume = apps.get_model('resumes', 'Resume')
@@ -169,4 +326,41 @@ class Migration(migrations.Migration):
 
     operations = [
         migrations.RunPython(create_missing_analytics),
-    ]
\ No newline at end of file
+    ]
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.create(user=instance)
+
+
+def add_owner_favorites(favorite, amount):
+    # Totals never go below zero, even for rows not reconciled yet
+    Resume.objects.filter(pk=favorite.resume_id).update(favorite_count=Greatest(models.F('favorite_count') + amount, 0))
+    # The owner's totals; favoriting your own resume does not count there
+    owner = Resume.objects.filter(pk=favorite.resume_id).values('user_id')
+    UserStats.objects.filter(user_id=models.Subquery(owner)).exclude(user=favorite.user_id).update(
+        favorites=Greatest(models.F('favorites') + amount, 0),
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_owner_favorites(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_favorite(sender, instance, **kwargs):
+    add_owner_favorites(instance, -1)
+
+
+@receiver(post_delete, sender=ResumeAnalytics)
+def uncount_resume_analytics(sender, instance, **kwargs):
+    # Deleting a resume cascades here before the resume row itself is gone
+    if instance.views or instance.downloads:
+        UserStats.objects.filter(user__resumes=instance.resume_id).update(
+            views=Greatest(models.F('views') - instance.views, 0),
+            downloads=Greatest(models.F('downloads') - instance.downloads, 0),
+        )
@@ -0,0 +1,21 @@
+# resumes/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class PublicResumeCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the public feed (`?pagination=cursor`).
+    Pages are fetched with `WHERE <field> < <cursor position>` on the (privacy_setting, field, id)
+    indexes instead of COUNT(*) and OFFSET, so deep pages cost the same as the first one.
+    The feed's `?ordering=` is honoured for the fields below; `id` breaks ties.
+    """
+    ordering = '-created_at'
+    ordering_fields = ('created_at', 'updated_at', 'title')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        field = ordering[0]
+        if field.lstrip('-') not in self.ordering_fields:
+            field = self.ordering
+        tiebreak = '-id' if field.startswith('-') else 'id'
+        return (field, tiebreak)
@@ -0,0 +1,194 @@
+# resumes/pdf_cache.py
+"""
+Content-addressed on-disk cache for rendered resume PDFs.
+
+Entries are keyed by a hash of everything that affects the rendered output
+(sanitized resume data, template name, template CSS and anonymization flag),
+so a changed resume simply produces a new key. The cache directory is kept
+under a total size budget by evicting the least recently used files. Each
+instance keeps a running total of the bytes stored, so a write only scans the
+directory when that total passes the budget or the last scan is older than
+FULL_SCAN_INTERVAL (other processes write to the same directory).
+
+Next to an entry the cache also holds small JSON job markers (<key>.pending,
+<key>.failed) through which the render service shares job state between web
+processes; they are not counted against the size budget, and eviction removes
+markers older than `marker_max_age`.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+# Seconds after which a write rescans the directory even under budget, to pick up the
+# other processes' writes and drop stale job markers
+FULL_SCAN_INTERVAL = 300
+
+
+class PDFCache:
+    """
+    Stores PDFs as <directory>/<key[:2]>/<key>.pdf.
+    File mtimes double as the LRU clock: hits touch the file, eviction removes the oldest.
+    """
+
+    suffix = ".pdf"
+    marker_suffixes = (".pending", ".failed")
+
+    def __init__(self, directory, max_bytes, marker_max_age=None):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.marker_max_age = marker_max_age
+        self._lock = threading.Lock()
+        # Bytes of PDFs as of the last scan plus this instance's writes since; None before the first scan
+        self._total = None
+        self._scanned_at = None
+
+    @staticmethod
+    def make_key(data, template_name, css_bytes, is_anonymized):
+        digest = hashlib.sha256()
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\0" + template_name.encode("utf-8"))
+        digest.update(b"\0" + hashlib.sha256(css_bytes).digest())
+        digest.update(b"\0" + (b"1" if is_anonymized else b"0"))
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return self.directory / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key):
+        """Return the path of a cached PDF (marking it as recently used) or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def marker_path(self, key, state):
+        return self.directory / key[:2] / f"{key}.{state.lower()}"
+
+    def set_marker(self, key, state, payload=None):
+        """Atomically write the `state` marker of `key` with a JSON payload."""
+        path = self.marker_path(key, state)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as tmp:
+                json.dump(payload or {}, tmp)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_marker(self, key, state, max_age=None):
+        """Return the payload of the `state` marker of `key`, or None if absent or older than `max_age` seconds."""
+        path = self.marker_path(key, state)
+        try:
+            if max_age is not None and time.time() - path.stat().st_mtime > max_age:
+                return None
+            return json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def clear_marker(self, key, state):
+        self.marker_path(key, state).unlink(missing_ok=True)
+
+    def put(self, key, pdf_bytes):
+        """Atomically store a rendered PDF and trim the cache back under its size budget."""
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        # Write to a temp file in the same directory so the final rename is atomic
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._total is not None:
+                self._total += len(pdf_bytes) - replaced
+            needs_scan = (self._total is None or self._total > self.max_bytes
+                          or time.monotonic() - self._scanned_at > FULL_SCAN_INTERVAL)
+        if needs_scan:
+            self.evict()
+        return path
+
+    def remove_stale_markers(self):
+        """Delete job markers older than marker_max_age; returns how many."""
+        if self.marker_max_age is None:
+            return 0
+        cutoff = time.time() - self.marker_max_age
+        removed = 0
+        for suffix in self.marker_suffixes:
+            for path in self.directory.glob(f"*/*{suffix}"):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def evict(self):
+        """
+        Scan the directory: remove least recently used entries until the cache fits in
+        max_bytes, remove stale job markers, and reset the running total.
+        """
+        self.remove_stale_markers()
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.glob(f"*/*{self.suffix}"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    total -= size
+            self._total = total
+            self._scanned_at = time.monotonic()
+
+
+_caches = {}
+
+
+def pdf_cache_for(directory, max_bytes, marker_max_age=None):
+    """Return the PDFCache for this configuration, memoized so its running total survives between writes."""
+    config = (str(directory), max_bytes, marker_max_age)
+    if config not in _caches:
+        _caches[config] = PDFCache(*config)
+    return _caches[config]
+
+
+def get_pdf_cache():
+    """
+    Return the PDFCache configured by PDF_CACHE_DIR / PDF_CACHE_MAX_BYTES / PDF_RENDER_FAILED_TTL.
+    Instances are memoized per configuration so settings overrides in tests pick up a fresh cache.
+    """
+    return pdf_cache_for(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_BYTES, settings.PDF_RENDER_FAILED_TTL)
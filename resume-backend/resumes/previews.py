@@ -0,0 +1,72 @@
+# resumes/previews.py
+"""
+Thumbnail previews for the public resume gallery.
+
+A preview is the first page of the anonymized PDF (the same render that
+ResumePDFDownloadView serves to other users), rasterized to a small PNG with
+poppler's pdftoppm. Files are stored per resume revision as
+PREVIEW_DIR/<resume id>/<revision>.png, so a preview URL never changes content
+and can be cached indefinitely. Previews are only produced in the background
+(see resumes.warmup) after writes; the newest stored revision is recorded in
+Resume.preview_revision, so request paths never touch the filesystem to find it.
+"""
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+
+class PreviewError(Exception):
+    """Raised when a PDF could not be rasterized."""
+
+
+def preview_dir(resume_id):
+    return Path(settings.PREVIEW_DIR) / str(resume_id)
+
+
+def preview_path(resume_id, revision):
+    return preview_dir(resume_id) / f"{revision}.png"
+
+
+def rasterize_first_page(pdf_path, output_path, width):
+    """Write page one of `pdf_path` as a PNG `width` pixels wide."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_path.parent) as tmp_dir:
+        # pdftoppm appends ".png" to the output root it is given
+        output_root = os.path.join(tmp_dir, "page")
+        try:
+            subprocess.run(
+                [settings.PREVIEW_PDFTOPPM, "-png", "-singlefile", "-f", "1", "-l", "1",
+                 "-scale-to-x", str(width), "-scale-to-y", "-1", str(pdf_path), output_root],
+                check=True, capture_output=True, timeout=settings.PDF_RENDER_TIMEOUT,
+            )
+        except (OSError, subprocess.SubprocessError) as exc:
+            raise PreviewError(f"Could not rasterize {pdf_path}: {exc}") from exc
+        os.replace(output_root + ".png", output_path)
+    return output_path
+
+
+def generate_preview(resume):
+    """Render (or reuse) the anonymized PDF and store its first page for the resume's current revision."""
+    from .models import Resume
+    from .rendering import get_render_service
+
+    target = preview_path(resume.pk, resume.revision)
+    if target.exists():
+        Resume.objects.filter(pk=resume.pk).update(preview_revision=resume.revision)
+        return target
+
+    render_service = get_render_service()
+    job_id = render_service.submit_resume(resume, is_anonymized=True)
+    pdf_path = render_service.wait(job_id, timeout=settings.PDF_RENDER_TIMEOUT)
+    rasterize_first_page(pdf_path, target, settings.PREVIEW_WIDTH)
+    Resume.objects.filter(pk=resume.pk).update(preview_revision=resume.revision)
+
+    # Older revisions are unreachable from listings once a newer preview exists
+    for stale in preview_dir(resume.pk).glob("*.png"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return target
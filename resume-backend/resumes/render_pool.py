@@ -0,0 +1,240 @@
+# resumes/render_pool.py
+"""
+Dedicated, recyclable processes for PDF rendering.
+
+WeasyPrint and its pydyf/fonttools stack keep growing a process over thousands of
+renders, so each worker is a separate "spawn" process that is replaced after
+`max_renders_per_worker` renders or once its RSS goes above `max_rss_bytes`.
+Every worker has a supervising thread in the web process that acts as a watchdog:
+a render still running after `wall_clock_limit` seconds gets its process killed
+and the job fails with RenderTimeout, so a pathological resume costs one worker
+restart instead of a web worker.
+
+Counters for renders, recycled workers, killed renders and render durations are
+kept per web process in `render_metrics`.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .render_worker import worker_main
+
+DEFAULT_TARGET = "resumes.render_worker.run_render_job"
+# Seconds a new worker gets to set up Django before its first job is sent
+WORKER_STARTUP_TIMEOUT = 60
+
+
+class RenderTimeout(Exception):
+    """Raised for renders killed by the watchdog."""
+
+
+class RenderWorkerDied(Exception):
+    """Raised when a worker process exits in the middle of a render."""
+
+
+class RenderMetrics:
+    """Thread-safe render counters; durations are kept as a cumulative histogram in seconds."""
+
+    DURATION_BUCKETS = (0.5, 1, 2, 5, 10, 30)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.renders = 0
+            self.failures = 0
+            self.workers_started = 0
+            self.workers_recycled = 0
+            self.renders_killed = 0
+            self.duration_count = 0
+            self.duration_sum = 0.0
+            self.duration_max = 0.0
+            self.duration_buckets = {bucket: 0 for bucket in self.DURATION_BUCKETS}
+
+    def record_render(self, duration, ok=True):
+        with self._lock:
+            self.renders += 1
+            if not ok:
+                self.failures += 1
+            self.duration_count += 1
+            self.duration_sum += duration
+            self.duration_max = max(self.duration_max, duration)
+            for bucket in self.DURATION_BUCKETS:
+                if duration <= bucket:
+                    self.duration_buckets[bucket] += 1
+
+    def record_worker_started(self):
+        with self._lock:
+            self.workers_started += 1
+
+    def record_worker_recycled(self):
+        with self._lock:
+            self.workers_recycled += 1
+
+    def record_render_killed(self):
+        with self._lock:
+            self.renders_killed += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "renders": self.renders,
+                "failures": self.failures,
+                "workers_started": self.workers_started,
+                "workers_recycled": self.workers_recycled,
+                "renders_killed": self.renders_killed,
+                "duration_seconds": {
+                    "count": self.duration_count,
+                    "sum": round(self.duration_sum, 6),
+                    "max": round(self.duration_max, 6),
+                    "buckets": {str(bucket): count for bucket, count in self.duration_buckets.items()},
+                },
+            }
+
+
+render_metrics = RenderMetrics()
+
+
+class RenderWorker:
+    """One worker process and the parent end of its pipe."""
+
+    def __init__(self, context, settings_module, target):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main, args=(child_conn, settings_module, target), daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+
+    def wait_ready(self, timeout=WORKER_STARTUP_TIMEOUT):
+        """Block until the worker has finished starting, so startup never counts against a render."""
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == "ready"
+        except (OSError, EOFError):
+            return False
+
+    def stop(self):
+        """Ask the worker to exit after its current job, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class RenderWorkerPool:
+    """
+    A fixed number of render workers fed from one queue.
+    `target` is the dotted path of the function each worker runs for a job.
+    """
+
+    def __init__(self, size, max_renders_per_worker, max_rss_bytes, wall_clock_limit,
+                 target=DEFAULT_TARGET, metrics=render_metrics):
+        self.size = size
+        self.max_renders_per_worker = max_renders_per_worker
+        self.max_rss_bytes = max_rss_bytes
+        self.wall_clock_limit = wall_clock_limit
+        self.target = target
+        self.metrics = metrics
+        self.settings_module = os.environ.get("DJANGO_SETTINGS_MODULE", "resume_project.settings")
+        self._context = multiprocessing.get_context("spawn")
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        """Queue `job` and return a Future resolving to the target's return value."""
+        self._start()
+        future = Future()
+        self._queue.put((job, future))
+        return future
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.size):
+                thread = threading.Thread(target=self._supervise, name=f"render-supervisor-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _spawn(self):
+        worker = RenderWorker(self._context, self.settings_module, self.target)
+        self.metrics.record_worker_started()
+        # A worker that fails to start is detected by the first job sent to it
+        worker.wait_ready()
+        return worker
+
+    def _supervise(self):
+        worker = self._spawn()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                worker.stop()
+                return
+            job, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if not worker.process.is_alive():
+                worker.kill()
+                worker = self._spawn()
+            worker = self._run(worker, job, future)
+
+    def _run(self, worker, job, future):
+        """Run one job on `worker`; returns the worker to use for the next job."""
+        started = time.monotonic()
+        try:
+            worker.conn.send(job)
+            finished = worker.conn.poll(self.wall_clock_limit)
+            reply = worker.conn.recv() if finished else None
+        except (OSError, EOFError):
+            self.metrics.record_render(time.monotonic() - started, ok=False)
+            future.set_exception(RenderWorkerDied(f"Render worker {worker.process.pid} exited during job {job.key}"))
+            worker.kill()
+            return self._spawn()
+        duration = time.monotonic() - started
+
+        if reply is None:
+            worker.kill()
+            self.metrics.record_render_killed()
+            self.metrics.record_render(duration, ok=False)
+            future.set_exception(RenderTimeout(f"Render exceeded {self.wall_clock_limit}s and was killed"))
+            return self._spawn()
+
+        ok, result, rss = reply
+        self.metrics.record_render(duration, ok=ok)
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(RuntimeError(result))
+
+        worker.renders += 1
+        if worker.renders >= self.max_renders_per_worker or (self.max_rss_bytes and rss > self.max_rss_bytes):
+            worker.stop()
+            self.metrics.record_worker_recycled()
+            return self._spawn()
+        return worker
+
+    def shutdown(self):
+        """Stop all workers once the jobs queued so far have finished."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
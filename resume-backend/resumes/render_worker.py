@@ -0,0 +1,90 @@
+# resumes/render_worker.py
+"""
+Code that runs inside PDF render worker processes.
+
+Workers are started with the "spawn" method, so this module is imported before
+Django is set up and must not import models at module level. The parent side of
+the pool lives in resumes.render_pool.
+"""
+import os
+
+import psutil
+from django.conf import settings
+from weasyprint import HTML
+
+from .asset_fetcher import asset_fetcher
+from .pdf_cache import get_pdf_cache, pdf_cache_for
+from .template_registry import template_registry
+
+
+class RenderJob:
+    """Everything a worker process needs to produce one PDF; must stay picklable."""
+
+    def __init__(self, key, template_name, html_string, base_url, cache_dir=None, cache_max_bytes=None):
+        self.key = key
+        self.template_name = template_name
+        self.html_string = html_string
+        self.base_url = base_url
+        # The submitting process's cache settings, so workers write where the web tier reads
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+
+
+def render_pdf(job):
+    """Render a job to PDF bytes with the registry's pre-parsed stylesheet."""
+    template = template_registry.get(job.template_name)
+    return HTML(
+        string=job.html_string,
+        base_url=job.base_url,
+        url_fetcher=asset_fetcher,
+    ).write_pdf(
+        stylesheets=[template.stylesheet],
+        font_config=template.font_config,
+        presentational_hints=True,
+    )
+
+
+def run_render_job(job):
+    """Render the job and store it in the PDF cache, returning the cached path."""
+    if job.cache_dir is not None:
+        pdf_cache = pdf_cache_for(job.cache_dir, job.cache_max_bytes, settings.PDF_RENDER_FAILED_TTL)
+    else:
+        pdf_cache = get_pdf_cache()
+    return str(pdf_cache.put(job.key, render_pdf(job)))
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    return psutil.Process().memory_info().rss
+
+
+def init_worker(settings_module):
+    """Pool initializer: worker processes are spawned fresh and need their own Django setup."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+def worker_main(conn, settings_module, target_path):
+    """
+    Main loop of a render worker process.
+    Announces itself once Django is set up, then receives jobs over `conn` until it
+    gets None, answering each with (ok, result, rss_bytes).
+    """
+    init_worker(settings_module)
+    from django.utils.module_loading import import_string
+
+    target = import_string(target_path)
+    conn.send("ready")
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            conn.send((True, target(job), current_rss()))
+        except Exception as exc:
+            conn.send((False, f"{type(exc).__name__}: {exc}", current_rss()))
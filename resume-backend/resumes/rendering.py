@@ -0,0 +1,224 @@
+# resumes/rendering.py
+"""
+Out-of-process PDF rendering.
+
+WeasyPrint is CPU bound, so PDFs are rendered by a pool of dedicated worker
+processes (see resumes.render_pool) fed through a bounded queue instead of inside
+the request worker. A job is identified
+by the content hash of its output (the PDF cache key), which lets identical
+requests coalesce onto one render and lets any web worker see a finished job by
+looking in the shared PDF cache. Jobs still running or failed in another web
+process are seen through the cache's .pending and .failed markers.
+
+A failed marker also acts as a negative cache: it records the resume revision
+the render was submitted for, and the same key is not rendered again (for any
+web process) until the resume's revision changes or PDF_RENDER_FAILED_TTL passes.
+Renders killed by the watchdog would otherwise be retried, and killed, on every
+download attempt. Only deterministic failures are recorded: a worker dying under
+a job or the pool shutting down says nothing about the resume, so those jobs just
+end without a result (RenderInterrupted) and may be retried right away.
+"""
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+from django.conf import settings
+
+from .pdf_cache import get_pdf_cache
+from .render_pool import RenderTimeout, RenderWorkerDied, RenderWorkerPool, render_metrics
+from .render_worker import RenderJob, run_render_job
+from .documents import resume_template_data
+from .template_registry import template_registry
+
+# Seconds between cache checks while waiting on a job submitted by another web process
+REMOTE_JOB_POLL_INTERVAL = 0.2
+
+
+class RenderQueueFull(Exception):
+    """Raised when the render queue has no free slots."""
+
+
+class RenderFailed(Exception):
+    """Raised when waiting on a job whose render failed."""
+
+
+class RenderInterrupted(Exception):
+    """Raised when waiting on a job that ended without a PDF or a recorded failure; it may be retried."""
+
+
+# Failures that are not the resume's fault and are never negative-cached
+TRANSIENT_RENDER_ERRORS = (RenderWorkerDied, RenderQueueFull, CancelledError)
+
+
+class RenderJobStatus:
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+def resume_render_key(resume, is_anonymized):
+    """Return (cache key, sanitized data, template entry) for rendering `resume`."""
+    data = resume_template_data(resume, is_anonymized=is_anonymized)
+    template = template_registry.get(resume.template)
+    key = get_pdf_cache().make_key(data, resume.template, template.css_digest.encode(), is_anonymized)
+    return key, data, template
+
+
+class RenderService:
+    """
+    Submits render jobs to a process pool with at most `max_queue` jobs in flight.
+    With `max_workers=0` jobs run inline in the calling thread (used by tests and local dev);
+    inline renders are counted in the metrics but not subject to the watchdog.
+    """
+
+    def __init__(self, max_workers, max_queue, max_renders_per_worker=200, max_rss_bytes=None,
+                 wall_clock_limit=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_renders_per_worker = max_renders_per_worker
+        self.max_rss_bytes = max_rss_bytes
+        self.wall_clock_limit = wall_clock_limit
+        self._pool = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = RenderWorkerPool(
+                self.max_workers,
+                max_renders_per_worker=self.max_renders_per_worker,
+                max_rss_bytes=self.max_rss_bytes,
+                wall_clock_limit=self.wall_clock_limit,
+            )
+        return self._pool
+
+    def submit_resume(self, resume, is_anonymized, request=None):
+        """Queue a render of `resume` unless an identical PDF is cached or already rendering. Returns the job id."""
+        key, data, template = resume_render_key(resume, is_anonymized)
+        job_status = self.status(key)
+        if job_status in (RenderJobStatus.DONE, RenderJobStatus.PENDING):
+            return key
+        if job_status == RenderJobStatus.FAILED and self.failed_revision(key) == resume.revision:
+            # Known to fail for this revision; callers report the recorded error instead of re-rendering
+            return key
+
+        html_string = template.render({"resume": data, "profile_image": None}, request=request)
+        return self.submit(RenderJob(
+            key, resume.template, html_string, f"file://{settings.BASE_DIR}",
+            cache_dir=str(settings.PDF_CACHE_DIR), cache_max_bytes=settings.PDF_CACHE_MAX_BYTES,
+        ), revision=resume.revision)
+
+    def submit(self, job, revision=None):
+        pdf_cache = get_pdf_cache()
+        with self._lock:
+            future = self._jobs.get(job.key)
+            if future is not None and not future.done():
+                return job.key
+            in_flight = sum(1 for f in self._jobs.values() if not f.done())
+            if in_flight >= self.max_queue:
+                raise RenderQueueFull("PDF render queue is full")
+
+            pdf_cache.clear_marker(job.key, RenderJobStatus.FAILED)
+            pdf_cache.set_marker(job.key, RenderJobStatus.PENDING)
+            if self.max_workers:
+                future = self._get_pool().submit(job)
+            else:
+                future = Future()
+            self._jobs[job.key] = future
+
+        if not self.max_workers:
+            started = time.monotonic()
+            try:
+                future.set_result(run_render_job(job))
+            except Exception as exc:
+                future.set_exception(exc)
+            render_metrics.record_render(time.monotonic() - started, ok=future.exception() is None)
+            self._finish(pdf_cache, job.key, revision, future)
+            return job.key
+
+        future.add_done_callback(lambda f, key=job.key: self._finish(pdf_cache, key, revision, f))
+        return job.key
+
+    def _finish(self, pdf_cache, key, revision, future):
+        # Publish the outcome to other web processes, then drop the local future: finished jobs
+        # are served from the PDF cache and failures from their marker
+        exc = CancelledError() if future.cancelled() else future.exception()
+        if exc is not None and not isinstance(exc, TRANSIENT_RENDER_ERRORS):
+            pdf_cache.set_marker(key, RenderJobStatus.FAILED, {
+                "error": str(exc), "revision": revision, "timeout": isinstance(exc, RenderTimeout),
+            })
+        pdf_cache.clear_marker(key, RenderJobStatus.PENDING)
+        with self._lock:
+            if self._jobs.get(key) is future:
+                del self._jobs[key]
+
+    def status(self, job_id):
+        """Return a RenderJobStatus value, or None if this job is unknown."""
+        future = self._jobs.get(job_id)
+        if future is not None and not future.done():
+            return RenderJobStatus.PENDING
+        pdf_cache = get_pdf_cache()
+        if pdf_cache.get(job_id):
+            return RenderJobStatus.DONE
+        if self.failure(job_id) is not None:
+            return RenderJobStatus.FAILED
+        if pdf_cache.get_marker(job_id, RenderJobStatus.PENDING, max_age=settings.PDF_RENDER_PENDING_TTL) is not None:
+            return RenderJobStatus.PENDING
+        return None
+
+    def failure(self, job_id):
+        """The recorded failure of a job ({"error", "revision", "timeout"}), or None."""
+        return get_pdf_cache().get_marker(job_id, RenderJobStatus.FAILED, max_age=settings.PDF_RENDER_FAILED_TTL)
+
+    def error(self, job_id):
+        failure = self.failure(job_id)
+        return failure.get("error") if failure is not None else None
+
+    def failed_revision(self, job_id):
+        """Return the resume revision a failed job was submitted for, or None."""
+        failure = self.failure(job_id)
+        return failure.get("revision") if failure is not None else None
+
+    def wait(self, job_id, timeout):
+        """
+        Block until the job finishes and return the cached PDF path.
+        Raises TimeoutError, the render error of a job still tracked here, RenderTimeout or
+        RenderFailed for a recorded failure, or RenderInterrupted for a job that ended without either.
+        """
+        future = self._jobs.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except CancelledError:
+                raise RenderInterrupted(f"Render job {job_id} was cancelled")
+        else:
+            # Finished, or rendering in another web process: follow the cache and its markers
+            deadline = time.monotonic() + timeout
+            while self.status(job_id) == RenderJobStatus.PENDING:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Render job {job_id} is still pending")
+                time.sleep(REMOTE_JOB_POLL_INTERVAL)
+            failure = self.failure(job_id)
+            if failure is not None:
+                raise (RenderTimeout if failure.get("timeout") else RenderFailed)(failure.get("error"))
+        path = get_pdf_cache().get(job_id)
+        if path is None:
+            raise RenderInterrupted(f"Render job {job_id} ended without a PDF")
+        return path
+
+
+_services = {}
+
+
+def get_render_service():
+    """Return the RenderService configured by the PDF_RENDER_* settings for this process."""
+    config = (
+        settings.PDF_RENDER_WORKERS,
+        settings.PDF_RENDER_QUEUE_SIZE,
+        settings.PDF_RENDER_MAX_RENDERS_PER_WORKER,
+        settings.PDF_RENDER_MAX_RSS_MB * 1024 * 1024,
+        settings.PDF_RENDER_WALL_CLOCK_LIMIT,
+    )
+    if config not in _services:
+        _services[config] = RenderService(*config)
+    return _services[config]
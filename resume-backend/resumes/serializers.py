@@ -1,8 +1,14 @@
 import re
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Project, Resume, PersonalDetails, Education, WorkExperience, Skill, Award 
 from django.contrib.auth import get_user_model
 from .enums import PrivacySettings, ResumeStatus
+from .template_registry import template_registry
+from .warmup import schedule_pdf_warmup
+from .documents import refresh_resume_document
 
 User = get_user_model()
 class PersonalDetailsSerializer(serializers.ModelSerializer):
@@ -16,18 +22,24 @@ class PersonalDetailsSerializer(serializers.ModelSerializer):
         extra_kwargs = {'resume': {'required': False}}
 
 class EducationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Education
         fields = '__all__'
         extra_kwargs = {'resume': {'required': False}}
 
 class WorkExperienceSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = WorkExperience
         fields = '__all__'
         extra_kwargs = {'resume': {'required': False}}
 
 class ProjectSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Project
         fields = '__all__'
@@ -35,12 +47,16 @@ class ProjectSerializer(serializers.ModelSerializer):
 
 
 class SkillSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Skill
         fields = '__all__'
         extra_kwargs = {'resume': {'required': False}}
 
 class AwardSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Award
         fields = '__all__'
@@ -58,6 +74,7 @@ class ResumeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     views_count = serializers.SerializerMethodField()
     downloads_count = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
     is_anonymized = serializers.BooleanField(required=False, default=False)
 
     def __init__(self, *args, **kwargs):
@@ -78,6 +95,7 @@ class ResumeSerializer(serializers.ModelSerializer):
             "is_anonymized",
             "created_at",
             "updated_at",
+            "revision",
             "user", 
             "personal_details", 
             "education", 
@@ -89,7 +107,9 @@ class ResumeSerializer(serializers.ModelSerializer):
             "is_favorited",
             "views_count",
             "downloads_count",
+            "preview_url",
         ]
+        read_only_fields = ["revision"]
 
     def get_user(self, obj):
         if obj.is_anonymized and obj.privacy_setting == PrivacySettings.PUBLIC:
@@ -185,13 +205,16 @@ class ResumeSerializer(serializers.ModelSerializer):
     def get_is_favorited(self, obj):
         request = self.context.get("request")
         if request and request.user.is_authenticated:
+            # Annotated by ResumeQuerySet.with_favorites() on list endpoints
+            if hasattr(obj, 'is_favorited_by_user'):
+                return obj.is_favorited_by_user
             return obj.favorited_by.filter(user=request.user).exists()
         return False
     
     def get_favorite_count(self, obj):
         request = self.context.get("request")
         if obj.resume_status == ResumeStatus.PUBLISHED and (request and request.user == obj.user):
-            return obj.favorited_by.count()
+            return obj.favorite_count
         return None
     
     def get_views_count(self, obj):
@@ -206,6 +229,19 @@ class ResumeSerializer(serializers.ModelSerializer):
             return obj.analytics.downloads if hasattr(obj, 'analytics') else 0
         return None
     
+    def get_preview_url(self, obj):
+        # Only points at a generated preview; listings never trigger rendering
+        if obj.privacy_setting != PrivacySettings.PUBLIC or obj.preview_revision is None:
+            return None
+        return reverse("resume-preview", args=[obj.pk, obj.preview_revision])
+
+    def validate_template(self, value):
+        if value not in template_registry:
+            raise serializers.ValidationError(
+                f"Unknown template. Choose one of: {', '.join(template_registry.names())}"
+            )
+        return value
+
     def validate(self, data):
         # 1) Determine the target status (incoming or current)
         resume_status = data.get(
@@ -227,6 +263,8 @@ class ResumeSerializer(serializers.ModelSerializer):
     
         # 4) Full validation for PUBLISHED
         errors = {}
+        # Which sections already exist on the instance, answered by a single query
+        existing = self.instance.section_flags() if self.instance else {}
     
         # 4a) Personal details
         if 'personal_details' in data:
@@ -241,32 +279,24 @@ class ResumeSerializer(serializers.ModelSerializer):
                     errors['personal_details'] = "A valid email address is required"
                 elif not re.match(r'^\+?\d{7,15}$', pd['phone']):
                     errors['personal_details'] = "A valid phone number is required"
-        elif not (self.instance and hasattr(self.instance, 'personal_details')):
+        elif not existing.get('has_personal_details'):
             errors['personal_details'] = "Required for published resumes"
     
         # 4b) Education (either in payload or already on the instance)
-        has_education = bool(data.get('education')) or (
-            self.instance and self.instance.education.exists()
-        )
+        has_education = bool(data.get('education')) or existing.get('has_education')
         if not has_education:
             errors['education'] = "At least one education entry is required"
     
         # 4c) Work experience OR projects
-        has_work = bool(data.get('work_experience')) or (
-            self.instance and self.instance.work_experience.exists()
-        )
-        has_proj = bool(data.get('projects')) or (
-            self.instance and self.instance.projects.exists()
-        )
+        has_work = bool(data.get('work_experience')) or existing.get('has_work_experience')
+        has_proj = bool(data.get('projects')) or existing.get('has_projects')
         if not (has_work or has_proj):
             errors['experience'] = (
                 "At least one work experience or project entry is required"
             )
     
         # 4d) Skills (either in payload or already on the instance)
-        has_skills = bool(data.get('skills')) or (
-            self.instance and self.instance.skills.exists()
-        )
+        has_skills = bool(data.get('skills')) or existing.get('has_skills')
         if not has_skills:
             errors['skills'] = "At least one skill is required"
     
@@ -277,6 +307,20 @@ class ResumeSerializer(serializers.ModelSerializer):
         return data
 
 
+    def to_representation(self, instance):
+        # With a ResumeDocument in the context the nested sections come from its "api" projection
+        document = self.context.get('document')
+        if document is None:
+            return super().to_representation(instance)
+        ret = {}
+        for field in self._readable_fields:
+            if field.field_name in document.api:
+                ret[field.field_name] = document.api[field.field_name]
+                continue
+            attribute = field.get_attribute(instance)
+            ret[field.field_name] = None if attribute is None else field.to_representation(attribute)
+        return ret
+
     def to_internal_value(self, data):
         internal = super().to_internal_value(data)
 
@@ -287,7 +331,10 @@ class ResumeSerializer(serializers.ModelSerializer):
         return internal
 
     
+    @transaction.atomic
     def create(self, validated_data):
+        # One transaction for the resume, its sections and the analytics row that the
+        # post_save receiver inserts, so a failure never leaves a partial resume behind
         # Mandatory fields
         personal_details_data = validated_data.pop('personal_details')
         education_data = validated_data.pop('education', [])
@@ -302,25 +349,34 @@ class ResumeSerializer(serializers.ModelSerializer):
         
         # Create required relationships
         PersonalDetails.objects.create(resume=resume, **personal_details_data)
-        Education.objects.bulk_create([Education(resume=resume, **edu) for edu in education_data])
-        WorkExperience.objects.bulk_create([WorkExperience(resume=resume, **work) for work in work_experience_data])
-        Skill.objects.bulk_create([Skill(resume=resume, **skill) for skill in skills_data])
+        Education.objects.bulk_create([Education(resume=resume, **without_id(edu)) for edu in education_data])
+        WorkExperience.objects.bulk_create([WorkExperience(resume=resume, **without_id(work)) for work in work_experience_data])
+        Skill.objects.bulk_create([Skill(resume=resume, **without_id(skill)) for skill in skills_data])
 
         if projects_data:
-            Project.objects.bulk_create([Project(resume=resume, **project) for project in projects_data])
+            Project.objects.bulk_create([Project(resume=resume, **without_id(project)) for project in projects_data])
 
         if awards_data:
-            Award.objects.bulk_create([Award(resume=resume, **award) for award in awards_data])
+            Award.objects.bulk_create([Award(resume=resume, **without_id(award)) for award in awards_data])
+
+        refresh_resume_document(resume)
+        if is_downloadable(resume):
+            transaction.on_commit(lambda: schedule_pdf_warmup(resume.pk))
         return resume
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        was_downloadable = is_downloadable(instance)
+
         # Update simple fields
         instance.title = validated_data.get('title', instance.title)
         instance.resume_status = validated_data.get('resume_status', instance.resume_status)
         instance.privacy_setting = validated_data.get('privacy_setting', instance.privacy_setting)
         instance.template = validated_data.get('template', instance.template)
         instance.is_anonymized = validated_data.get('is_anonymized', instance.is_anonymized)
+        instance.revision = F('revision') + 1
         instance.save()
+        instance.refresh_from_db(fields=['revision'])
 
         # Update personal details
         personal_details_data = validated_data.get('personal_details', {})
@@ -342,15 +398,52 @@ class ResumeSerializer(serializers.ModelSerializer):
         if 'awards' in validated_data:
             self.update_related_objects(instance, 'awards', Award, validated_data.get('awards', []))
 
+        refresh_resume_document(instance)
+
+        # Pre-render PDFs once a resume becomes visible to other users. Any write to a public
+        # resume, including making it public, changes the cache key of its PDFs and its preview.
+        is_public = instance.privacy_setting == PrivacySettings.PUBLIC
+        if (is_downloadable(instance) and not was_downloadable) or is_public:
+            transaction.on_commit(lambda: schedule_pdf_warmup(instance.pk))
+
         return instance
 
     def update_related_objects(self, resume, field_name, model_class, items_data):
-        # Delete existing items
-        getattr(resume, field_name).all().delete()
-        # Create new items
-        if items_data:
-            objects = [model_class(resume=resume, **item_data) for item_data in items_data]
-            model_class.objects.bulk_create(objects)
+        """
+        Sync one nested section with `items_data`. Items carrying the `id` of an existing row
+        are updated in place, and only when a field actually changed; items without a known id
+        are inserted and rows missing from the payload are deleted. The caller bumps the revision.
+        """
+        existing = {obj.pk: obj for obj in getattr(resume, field_name).all()}
+        to_create, to_update, changed_fields = [], [], set()
+        for item_data in items_data:
+            item_data = {k: v for k, v in item_data.items() if k != 'resume'}
+            obj = existing.pop(item_data.pop('id', None), None)
+            if obj is None:
+                to_create.append(model_class(resume=resume, **item_data))
+                continue
+            changed = [attr for attr, value in item_data.items() if getattr(obj, attr) != value]
+            for attr in changed:
+                setattr(obj, attr, item_data[attr])
+            if changed:
+                to_update.append(obj)
+                changed_fields.update(changed)
+
+        with transaction.atomic():
+            # Whatever is left in `existing` was not mentioned in the payload
+            if existing:
+                model_class.objects.filter(pk__in=existing).delete()
+            if to_update:
+                model_class.objects.bulk_update(to_update, sorted(changed_fields))
+            if to_create:
+                model_class.objects.bulk_create(to_create)
+
+def without_id(item_data):
+    # Nested items may echo ids from another resume; new rows always get fresh ones
+    return {k: v for k, v in item_data.items() if k != 'id'}
+
+def is_downloadable(resume):
+    return resume.resume_status == ResumeStatus.PUBLISHED or resume.privacy_setting == PrivacySettings.PUBLIC
 
 def sanitize_resume_data(resume, is_anonymized=False):
     return {
@@ -0,0 +1,129 @@
+# resumes/template_registry.py
+"""
+Per-process registry of resume templates.
+
+Every `resumes/template_*.html` template with a matching `resumes/css/template_*.css`
+stylesheet is registered on first use. For each template the registry keeps the
+compiled Django template, the resolved CSS path and a pre-parsed WeasyPrint
+stylesheet, all sharing one FontConfiguration. Stylesheets are re-parsed when the
+CSS file's mtime changes, so editing CSS does not require a restart.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from django.contrib.staticfiles.finders import find as find_static
+from django.template.loader import get_template
+
+from .asset_fetcher import asset_fetcher
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates" / "resumes"
+TEMPLATE_PREFIX = "template_"
+
+
+class UnknownTemplateError(LookupError):
+    """Raised when a resume references a template that is not registered."""
+
+
+class TemplateEntry:
+    def __init__(self, name, css_path, font_config):
+        self.name = name
+        self.css_path = css_path
+        self.font_config = font_config
+        self.template = get_template(f"resumes/{name}.html")
+        self.css_mtime = None
+        self.css_digest = None
+        self._stylesheet = None
+        self._lock = threading.Lock()
+
+    @property
+    def stylesheet(self):
+        """The parsed WeasyPrint CSS object, reloaded if the file changed on disk."""
+        self.refresh()
+        return self._stylesheet
+
+    def refresh(self):
+        mtime = os.stat(self.css_path).st_mtime_ns
+        if mtime == self.css_mtime and self._stylesheet is not None:
+            return
+        with self._lock:
+            if mtime == self.css_mtime and self._stylesheet is not None:
+                return
+            from weasyprint import CSS
+
+            with open(self.css_path, "rb") as css_file:
+                css_bytes = css_file.read()
+            self._stylesheet = CSS(
+                string=css_bytes.decode("utf-8"),
+                base_url=self.css_path,
+                url_fetcher=asset_fetcher,
+                font_config=self.font_config,
+            )
+            self.css_digest = hashlib.sha256(css_bytes).hexdigest()
+            self.css_mtime = mtime
+
+    def render(self, context, request=None):
+        return self.template.render(context, request)
+
+
+class TemplateRegistry:
+    def __init__(self, templates_dir=TEMPLATES_DIR):
+        self.templates_dir = Path(templates_dir)
+        self._entries = None
+        self._font_config = None
+        self._lock = threading.Lock()
+
+    @property
+    def font_config(self):
+        if self._font_config is None:
+            from weasyprint.text.fonts import FontConfiguration
+
+            self._font_config = FontConfiguration()
+        return self._font_config
+
+    def _discover(self):
+        entries = {}
+        for html_path in sorted(self.templates_dir.glob(f"{TEMPLATE_PREFIX}*.html")):
+            name = html_path.stem
+            css_path = find_static(f"resumes/css/{name}.css")
+            if not css_path or not os.path.exists(css_path):
+                continue
+            entries[name] = (css_path, None)
+        return entries
+
+    def _load(self):
+        if self._entries is None:
+            with self._lock:
+                if self._entries is None:
+                    self._entries = self._discover()
+        return self._entries
+
+    def names(self):
+        return sorted(self._load())
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def get(self, name):
+        """Return the TemplateEntry for `name`, raising UnknownTemplateError if it is not registered."""
+        entries = self._load()
+        if name not in entries:
+            raise UnknownTemplateError(f"Unknown resume template: {name}")
+
+        css_path, entry = entries[name]
+        if entry is None:
+            with self._lock:
+                css_path, entry = entries[name]
+                if entry is None:
+                    entry = TemplateEntry(name, css_path, self.font_config)
+                    entries[name] = (css_path, entry)
+        entry.refresh()
+        return entry
+
+    def reset(self):
+        with self._lock:
+            self._entries = None
+
+
+template_registry = TemplateRegistry()
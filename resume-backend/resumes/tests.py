@@ -1,23 +1,73 @@
 """
 resumes/tests.py
-API and utility tests for the resumes app: CRUD endpoints, privacy/anonymization, favorites, sanitize, PDF util, detailed view, HTML/PDF rendering, stats.
+API and utility tests for the resumes app: CRUD endpoints, privacy/anonymization, favorites, sanitize, PDF util, detailed view, HTML/PDF rendering, PDF cache, stats.
 """
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from io import StringIO
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, transaction
+from django.db.models import Count
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from unittest.mock import patch, MagicMock
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Resume, PersonalDetails, Education, WorkExperience, Skill, Award, Favorite, ResumeAnalytics
-from .serializers import sanitize_resume_data
+from resume_project.db_router import primary_pin_key
+from resume_project.query_budget import QueryBudgetTestMixin
+from .models import (Resume, PersonalDetails, Education, WorkExperience, Skill, Award, Favorite, ResumeAnalytics,
+                     ResumeDocument, ResumeEvent, ResumeAnalyticsRollup, ResumeViewerSketch, UserStats)
+from .analytics import compact_events, rollup_events, unique_viewers
+from .hll import HyperLogLog, REGISTER_COUNT
+from .serializers import ResumeSerializer, sanitize_resume_data
 from .utils import generate_resume_pdf
+from .pdf_cache import PDFCache, get_pdf_cache
+from .counters import CounterBuffer, resume_counters
+from .documents import refresh_resume_document, resume_template_data
+from .template_registry import TemplateRegistry, UnknownTemplateError
+from .rendering import RenderFailed, RenderInterrupted, RenderJobStatus, RenderQueueFull, RenderService
+from .render_worker import RenderJob
+from .render_pool import RenderMetrics, RenderTimeout, RenderWorkerDied, RenderWorkerPool
+from .warmup import WarmupScheduler, warm_resume_pdfs
+from .asset_fetcher import AssetStore, RemoteAssetBlocked
+from .render_worker import render_pdf
+from .previews import generate_preview
 
 User = get_user_model()
 
+
+def pid_render_job(job):
+    """Render pool target for tests: reports which worker process ran the job."""
+    return os.getpid()
+
+
+def slow_render_job(job):
+    time.sleep(30)
+
+
+@override_settings(PDF_RENDER_WORKERS=0, ANALYTICS_FLUSH_INTERVAL=0)
 class ResumeAPITests(APITestCase):
     def setUp(self):
+        self.addCleanup(resume_counters.flush)
+        # Fresh PDF cache per test: keys are content hashes and would otherwise be shared between tests
+        cache_dir, preview_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, preview_dir, ignore_errors=True)
+        cache_settings = override_settings(PDF_CACHE_DIR=cache_dir, PREVIEW_DIR=preview_dir)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
         # Create two users
         self.user1 = User.objects.create_user(username='user1', email='u1@example.com', password='Pass1234', is_active=True)
         self.user2 = User.objects.create_user(username='user2', email='u2@example.com', password='Pass1234', is_active=True)
@@ -55,6 +105,25 @@ class ResumeAPITests(APITestCase):
         resp = self.client.post(self.list_url, payload, format='json')
         self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
 
+    def test_create_resume_is_atomic(self):
+        payload = {
+            'title': 'Atomic', 'resume_status': 'DRAFT', 'template': 'template_classic',
+            'personal_details': {'first_name': 'A', 'last_name': 'B', 'email': 'a@b.com', 'phone': '+1000000000'},
+            'education': [], 'work_experience': [], 'skills': [{'skill_name': 'S'}],
+        }
+        with patch.object(Skill.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                self.client.post(self.list_url, payload, format='json')
+        self.assertFalse(Resume.objects.filter(title='Atomic').exists())
+        self.assertFalse(ResumeAnalytics.objects.filter(resume__title='Atomic').exists())
+
+        resp = self.client.post(self.list_url, payload, format='json')
+        self.assertTrue(ResumeAnalytics.objects.filter(resume_id=resp.data['id']).exists())
+        # later saves no longer look up the analytics row
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(reverse('resume-detail', args=[resp.data['id']]), {'title': 'Renamed'}, format='json')
+        self.assertFalse(any('resumes_resumeanalytics' in q['sql'] for q in queries.captured_queries))
+
     def test_create_resume_publish_missing_fields(self):
         payload = {'title': 'Pub', 'resume_status': 'PUBLISHED'}
         resp = self.client.post(self.list_url, payload, format='json')
@@ -80,6 +149,67 @@ class ResumeAPITests(APITestCase):
         self.assertEqual(resp_del.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Resume.objects.filter(id=resume.id).exists())
 
+    def test_publish_validation_uses_one_query(self):
+        resume = self.create_minimal_resume()
+        bare = Resume.objects.create(user=self.user1, title='Bare', resume_status='DRAFT')
+        detail = lambda r: reverse('resume-detail', args=[r.id])
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.patch(detail(resume), {'resume_status': 'PUBLISHED'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        section_checks = [q for q in queries.captured_queries if 'EXISTS' in q['sql']]
+        self.assertEqual(len(section_checks), 1)
+        resp = self.client.patch(detail(bare), {'resume_status': 'PUBLISHED'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['personal_details'][0], 'Required for published resumes')
+        self.assertEqual(resp.data['education'][0], 'At least one education entry is required')
+        self.assertEqual(resp.data['experience'][0], 'At least one work experience or project entry is required')
+        self.assertEqual(resp.data['skills'][0], 'At least one skill is required')
+
+    def test_nested_update_diffs_rows(self):
+        resume = self.create_minimal_resume()
+        kept = Education.objects.get(resume=resume)
+        edited = Education.objects.create(resume=resume, institution='College', start_date='2018-01-01')
+        removed = Education.objects.create(resume=resume, institution='School', start_date='2015-01-01')
+        payload = {'education': [
+            {'id': kept.id, 'institution': 'Uni', 'start_date': '2020-01-01'},
+            {'id': edited.id, 'institution': 'College', 'major': 'Maths', 'start_date': '2018-01-01'},
+            {'institution': 'Bootcamp', 'start_date': '2022-01-01'},
+        ]}
+        with patch.object(Education.objects, 'bulk_update', wraps=Education.objects.bulk_update) as bulk_update:
+            resp = self.client.patch(reverse('resume-detail', args=[resume.id]), payload, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        # only the edited row is written, and only the changed column
+        (objs, fields), _ = bulk_update.call_args
+        self.assertEqual([obj.id for obj in objs], [edited.id])
+        self.assertEqual(fields, ['major'])
+        rows = {e.institution: e for e in Education.objects.filter(resume=resume)}
+        self.assertEqual(set(rows), {'Uni', 'College', 'Bootcamp'})
+        self.assertEqual(rows['Uni'].id, kept.id)
+        self.assertEqual(rows['College'].major, 'Maths')
+        self.assertFalse(Education.objects.filter(id=removed.id).exists())
+
+    def test_detail_reads_materialized_document(self):
+        resume = self.create_minimal_resume(status='PUBLISHED')
+        detail_url = reverse('resume-detail', args=[resume.id])
+        self.client.patch(detail_url, {'education': [{'institution': 'Docs U', 'start_date': '2019-09-01'}]}, format='json')
+        document = ResumeDocument.objects.get(resume=resume)
+        self.assertEqual(document.revision, Resume.objects.get(pk=resume.pk).revision)
+        self.assertEqual(document.api['education'][0]['institution'], 'Docs U')
+        self.assertEqual(document.owner['education'][0]['start_date'], '2019-09-01')
+        # the document-backed response matches a live serialization
+        resp = self.client.get(detail_url)
+        self.assertEqual(resp.data, ResumeSerializer(Resume.objects.get(pk=resume.pk)).data)
+        # templates still get real dates back
+        data = resume_template_data(Resume.objects.get(pk=resume.pk))
+        self.assertEqual(data['education'][0]['start_date'], datetime.date(2019, 9, 1))
+
+    def test_rebuild_resume_documents_command(self):
+        resumes = [self.create_minimal_resume() for _ in range(3)]
+        ResumeDocument.objects.all().delete()
+        call_command('rebuild_resume_documents', batch_size=2, stdout=StringIO())
+        self.assertEqual(ResumeDocument.objects.filter(resume__in=resumes).count(), 3)
+        self.assertEqual(ResumeDocument.objects.get(resume=resumes[0]).api['skills'][0]['skill_name'], 'Python')
+
     # Public list excludes owner
     def test_public_resumes_excludes_own(self):
         r1 = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
@@ -90,6 +220,62 @@ class ResumeAPITests(APITestCase):
         for r in resp.data.get('results', []):
             self.assertNotEqual(r['user']['id'], self.user1.id)
 
+    # Query counts do not grow with the number of listed resumes
+    def count_list_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return len(queries), len(resp.data['results'])
+
+    def test_list_query_count_is_constant(self):
+        refresh2 = RefreshToken.for_user(self.user2)
+        user2_auth = f'Bearer {str(refresh2.access_token)}'
+        counts = {}
+        for rows in (1, 10):
+            while Resume.objects.filter(user=self.user1).count() < rows:
+                resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+                Favorite.objects.create(user=self.user2, resume=resume)
+            self.client.credentials(HTTP_AUTHORIZATION=user2_auth)
+            counts[('public', rows)] = self.count_list_queries(reverse('public-resumes'))
+            self.client.logout()
+            counts[('anonymous', rows)] = self.count_list_queries(reverse('public-resumes'))
+            self.client.force_authenticate(self.user1)
+            counts[('owner', rows)] = self.count_list_queries(self.list_url)
+            self.client.force_authenticate(None)
+        for view in ('public', 'anonymous', 'owner'):
+            self.assertEqual(counts[(view, 1)][1], 1)
+            self.assertEqual(counts[(view, 10)][1], 10)
+            self.assertEqual(counts[(view, 1)][0], counts[(view, 10)][0], view)
+
+    def test_public_feed_cursor_pagination(self):
+        created = [Resume.objects.create(user=self.user1, title=f'P{i:02}', resume_status='PUBLISHED',
+                                         privacy_setting='PUBLIC') for i in range(12)]
+        self.client.force_authenticate(self.user2)
+        for ordering, expected in (('-created_at', created[::-1]), ('title', created)):
+            url = reverse('public-resumes') + f'?pagination=cursor&ordering={ordering}'
+            seen = []
+            while url:
+                with CaptureQueriesContext(connection) as queries:
+                    page = self.client.get(url).data
+                self.assertNotIn('count', page)
+                self.assertFalse(any('"__count"' in q['sql'] for q in queries.captured_queries))
+                seen += [r['id'] for r in page['results']]
+                url = page['next']
+            self.assertEqual(seen, [r.id for r in expected])
+        # page numbers remain the default
+        self.assertEqual(self.client.get(reverse('public-resumes')).data['count'], 12)
+
+    def test_list_favorite_annotations(self):
+        favorited = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        other = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        Favorite.objects.create(user=self.user2, resume=favorited)
+        self.client.force_authenticate(self.user2)
+        listing = self.client.get(reverse('public-resumes')).data['results']
+        self.assertEqual({r['id']: r['is_favorited'] for r in listing}, {favorited.id: True, other.id: False})
+        self.client.force_authenticate(self.user1)
+        listing = self.client.get(self.list_url).data['results']
+        self.assertEqual(sorted(r['favorite_count'] for r in listing), [0, 1])
+
     # Favorites
     def test_toggle_favorite(self):
         resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
@@ -102,10 +288,62 @@ class ResumeAPITests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
         resp2 = self.client.post(fav_url)
         self.assertTrue(resp2.data['is_favorited'])
+        self.assertEqual(resp2.data['favorite_count'], 1)
+        self.assertEqual(resp2.data['resume']['id'], resume.id)
         # analytics count
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
         resp3 = self.client.post(fav_url)
         self.assertFalse(resp3.data['is_favorited'])
+        resume.refresh_from_db()
+        self.assertEqual(resume.favorite_count, 0)
+
+    def test_toggle_favorite_compact(self):
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        fav_url = reverse('resume-favorite', args=[resume.id]) + '?compact=true'
+        self.client.force_authenticate(self.user2)
+        for expected in (True, False, True):
+            with CaptureQueriesContext(connection) as queries:
+                resp = self.client.post(fav_url)
+            statements = [q['sql'].split()[0] for q in queries.captured_queries
+                          if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+            # The locking lookup and the INSERT (or the DELETE and the lookup of the rows it removes),
+            # then the resume and owner counter updates
+            writes = ['INSERT'] if expected else ['SELECT', 'DELETE']
+            self.assertEqual(statements, ['SELECT', *writes, 'UPDATE', 'UPDATE'])
+            self.assertEqual(resp.data, {'is_favorited': expected, 'favorite_count': int(expected)})
+        resume.refresh_from_db()
+        self.assertEqual(resume.favorite_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.user1).favorites, 1)
+
+    def test_toggle_favorite_race_with_stale_lookup(self):
+        # A double click: the second request's lookup still has the state from before the first committed
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        fav_url = reverse('resume-favorite', args=[resume.id]) + '?compact=true'
+        other = User.objects.create_user(username='racer', email='racer@example.com', password='p')
+        Favorite.objects.create(user=other, resume=resume)
+        self.client.force_authenticate(self.user2)
+        self.client.post(fav_url)
+        stale_id = Favorite.objects.get(user=self.user2).pk
+
+        def stale_lookup(favorite_id):
+            def lookup(queryset, **kwargs):
+                found = queryset.get(**kwargs)
+                found.favorite_id = favorite_id
+                return found
+            return lookup
+
+        with patch('resumes.views.get_object_or_404', side_effect=stale_lookup(None)):
+            resp = self.client.post(fav_url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp.data, {'is_favorited': True, 'favorite_count': 2})
+
+        Favorite.objects.get(user=self.user2).delete()
+        with patch('resumes.views.get_object_or_404', side_effect=stale_lookup(stale_id)):
+            resp = self.client.post(fav_url)
+        self.assertEqual(resp.data, {'is_favorited': False, 'favorite_count': 1})
+        resume.refresh_from_db()
+        self.assertEqual(resume.favorite_count, 1)
+        self.assertEqual(UserStats.objects.get(user=self.user1).favorites, 1)
 
     # HTML View & Analytics
     def test_html_view_owner_and_analytics(self):
@@ -119,8 +357,15 @@ class ResumeAPITests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
         resp_non = self.client.get(view_url)
         self.assertEqual(resp_non.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(view_url).status_code, status.HTTP_200_OK)
+        self.assertEqual(resume_counters.pending()[resume.id]['views'], 2)
+        resume_counters.flush()
         analytics = ResumeAnalytics.objects.get(resume=resume)
-        self.assertEqual(analytics.views, 1)
+        self.assertEqual(analytics.views, 2)
+        # A refresh is another view but not another viewer
+        today = datetime.date.today()
+        self.assertEqual(unique_viewers(resume.id, today - datetime.timedelta(days=1),
+                                        today + datetime.timedelta(days=2))[0], 1)
 
     def test_html_view_private_forbidden(self):
         resume = self.create_minimal_resume(status='PUBLISHED', privacy='PRIVATE')
@@ -131,10 +376,8 @@ class ResumeAPITests(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_403_FORBIDDEN)
 
     # PDF Download & Analytics
-    @patch('resumes.views.HTML')
-    @patch('resumes.views.render_to_string', return_value='<html></html>')
-    @patch('resumes.views.find_static', return_value=__file__)
-    def test_pdf_download_and_analytics(self, mock_find, mock_render, mock_html):
+    @patch('resumes.render_worker.HTML')
+    def test_pdf_download_and_analytics(self, mock_html):
         mocked = MagicMock()
         mocked.write_pdf.return_value = b'%PDF'
         mock_html.return_value = mocked
@@ -145,6 +388,7 @@ class ResumeAPITests(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
         resp = self.client.get(download_url)
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        resume_counters.flush()
         analytics = ResumeAnalytics.objects.get(resume=resume)
         self.assertEqual(analytics.downloads, 1)
         # private forbidden
@@ -152,22 +396,265 @@ class ResumeAPITests(APITestCase):
         resp2 = self.client.get(download_url)
         self.assertEqual(resp2.status_code, status.HTTP_403_FORBIDDEN)
 
+    @patch('resumes.render_worker.HTML')
+    def test_pdf_download_served_from_cache(self, mock_html):
+        mocked = MagicMock()
+        mocked.write_pdf.return_value = b'%PDF-cached'
+        mock_html.return_value = mocked
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        resume.title = 'Cached'; resume.save()
+        download_url = reverse('resume-download', args=[resume.id])
+        resp1 = self.client.get(download_url)
+        resp2 = self.client.get(download_url)
+        self.assertEqual(resp1.getvalue(), b'%PDF-cached')
+        self.assertEqual(resp2.getvalue(), b'%PDF-cached')
+        self.assertEqual(mocked.write_pdf.call_count, 1)
+        # editing the resume changes the key and forces a fresh render
+        resume.title = 'Cached v2'; resume.save()
+        self.client.get(download_url)
+        self.assertEqual(mocked.write_pdf.call_count, 2)
+
+    @patch('resumes.render_worker.HTML')
+    def test_unknown_template_rejected(self, mock_html):
+        resume = self.create_minimal_resume()
+        detail_url = reverse('resume-detail', args=[resume.id])
+        resp = self.client.patch(detail_url, {'template': 'template_missing'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('template', resp.data)
+        # rows written outside the API are refused before rendering starts
+        Resume.objects.filter(pk=resume.pk).update(template='template_missing')
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        mock_html.assert_not_called()
+
+    @patch('resumes.render_worker.HTML')
+    def test_render_job_api(self, mock_html):
+        mocked = MagicMock()
+        mocked.write_pdf.return_value = b'%PDF-job'
+        mock_html.return_value = mocked
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        resp = self.client.post(reverse('resume-render-jobs', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_202_ACCEPTED)
+        job_id = resp.data['job_id']
+        resp_status = self.client.get(resp.data['status_url'])
+        self.assertEqual(resp_status.data['status'], 'DONE')
+        resp_pdf = self.client.get(resp.data['pdf_url'])
+        self.assertEqual(resp_pdf.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp_pdf.getvalue(), b'%PDF-job')
+        # the owner's job id is not valid for another viewer, who gets the anonymized render
+        refresh2 = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
+        resp_other = self.client.get(reverse('resume-render-job-pdf', args=[resume.id, job_id]))
+        self.assertEqual(resp_other.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch('resumes.rendering.RenderService.submit', side_effect=RenderQueueFull)
+    def test_pdf_download_queue_full(self, mock_submit):
+        resume = self.create_minimal_resume()
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(resp['Retry-After'], '5')
+
+    @patch('resumes.render_worker.render_pdf', side_effect=RenderTimeout('killed'))
+    def test_pdf_download_render_killed(self, mock_render):
+        resume = self.create_minimal_resume()
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        # retries are answered from the failure marker without rendering again
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(mock_render.call_count, 1)
+        # until the resume's revision changes
+        resume.bump_revision()
+        self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(mock_render.call_count, 2)
+        # render counters are admin-only
+        self.assertEqual(self.client.get(reverse('render-metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.user1.is_staff = True
+        self.user1.save()
+        metrics = self.client.get(reverse('render-metrics')).json()
+        self.assertGreaterEqual(metrics['failures'], 1)
+
+    @patch('resumes.render_worker.render_pdf', side_effect=RenderWorkerDied('worker exited'))
+    def test_pdf_download_worker_died_can_be_retried(self, mock_render):
+        resume = self.create_minimal_resume()
+        for attempt in (1, 2):
+            resp = self.client.get(reverse('resume-download', args=[resume.id]))
+            self.assertEqual(resp.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(mock_render.call_count, attempt)
+
+    @patch('resumes.render_worker.render_pdf', side_effect=ValueError('weasyprint error'))
+    def test_pdf_download_render_error(self, mock_render):
+        resume = self.create_minimal_resume()
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertEqual(resp.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(resp.data, {'error': 'Resume could not be rendered as PDF'})
+
+    @patch('resumes.serializers.schedule_pdf_warmup')
+    def test_publish_schedules_pdf_warmup(self, mock_schedule):
+        resume = self.create_minimal_resume()
+        detail_url = reverse('resume-detail', args=[resume.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, {'title': 'Still draft'}, format='json')
+        mock_schedule.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.patch(detail_url, {'resume_status': 'PUBLISHED'}, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        mock_schedule.assert_called_once_with(resume.id)
+        # further edits of a published, private resume are not a transition
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, {'title': 'Still private'}, format='json')
+        mock_schedule.assert_called_once_with(resume.id)
+        # making it public changes the PDF cache key, so the public PDFs are warmed again
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url, {'privacy_setting': 'PUBLIC'}, format='json')
+        self.assertEqual(mock_schedule.call_count, 2)
+        mock_schedule.assert_called_with(resume.id)
+
+    @patch('resumes.render_worker.HTML')
+    def test_pdf_download_streams_file(self, mock_html):
+        mocked = MagicMock()
+        mocked.write_pdf.return_value = b'%PDF-stream'
+        mock_html.return_value = mocked
+        resume = self.create_minimal_resume()
+        resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertTrue(resp.streaming)
+        self.assertEqual(resp['Content-Length'], str(len(b'%PDF-stream')))
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="Test.pdf"')
+        self.assertEqual(resp.getvalue(), b'%PDF-stream')
+
+    @patch('resumes.render_worker.HTML')
+    def test_pdf_download_offloaded_to_nginx(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF'
+        resume = self.create_minimal_resume()
+        with self.settings(PDF_SENDFILE_BACKEND='x-accel-redirect', PDF_SENDFILE_URL_PREFIX='/protected-pdfs/'):
+            resp = self.client.get(reverse('resume-download', args=[resume.id]))
+        self.assertFalse(resp.streaming)
+        self.assertEqual(resp.content, b'')
+        self.assertRegex(resp['X-Accel-Redirect'], r'^/protected-pdfs/[0-9a-f]{2}/[0-9a-f]{64}\.pdf$')
+        self.assertEqual(resp['Content-Disposition'], 'attachment; filename="Test.pdf"')
+
+    # Gallery previews
+    def fake_rasterize(self, pdf_path, output_path, width):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as f:
+            f.write(b'\x89PNG')
+        return output_path
+
+    @patch('resumes.render_worker.HTML')
+    def test_preview_generated_and_served_with_long_cache(self, mock_html):
+        mock_html.return_value.write_pdf.return_value = b'%PDF'
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        with patch('resumes.previews.rasterize_first_page', side_effect=self.fake_rasterize):
+            generate_preview(resume)
+        # the anonymized render is the one rasterized
+        self.assertIn('Anonymous', mock_html.call_args.kwargs['string'])
+        resume.refresh_from_db()
+        self.assertEqual(resume.preview_revision, resume.revision)
+        url = reverse('resume-preview', args=[resume.id, resume.revision])
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(resp.getvalue(), b'\x89PNG')
+
+        # other users see the preview in the gallery without any rendering
+        refresh2 = RefreshToken.for_user(self.user2)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(refresh2.access_token)}')
+        with patch('resumes.rendering.RenderService.submit_resume') as mock_submit:
+            listing = self.client.get(reverse('public-resumes'))
+        mock_submit.assert_not_called()
+        self.assertEqual(listing.data['results'][0]['preview_url'], url)
+
+    @patch('resumes.warmup.schedule_pdf_warmup')
+    def test_missing_preview_is_not_rendered_inline(self, mock_schedule):
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        resp = self.client.get(reverse('resume-preview', args=[resume.id, resume.revision]))
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        mock_schedule.assert_not_called()
+        private = self.create_minimal_resume()
+        resp = self.client.get(reverse('resume-preview', args=[private.id, private.revision]))
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+
+    # Revisions & conditional requests
+    def test_revision_bumps_on_every_write(self):
+        resume = self.create_minimal_resume()
+        detail_url = reverse('resume-detail', args=[resume.id])
+        self.client.patch(detail_url, {'title': 'Renamed'}, format='json')
+        resume.refresh_from_db()
+        self.assertEqual(resume.revision, 1)
+        self.client.patch(detail_url, {'skills': [{'skill_name': 'Go'}]}, format='json')
+        resume.refresh_from_db()
+        self.assertEqual(resume.revision, 2)
+
+    def test_detail_etag_not_modified(self):
+        resume = self.create_minimal_resume()
+        detail_url = reverse('resume-detail', args=[resume.id])
+        resp = self.client.get(detail_url)
+        etag = resp['ETag']
+        self.assertIn('Last-Modified', resp)
+        with patch('resumes.views.ResumeSerializer') as mock_serializer:
+            resp_cached = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp_cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        mock_serializer.assert_not_called()
+        # nested edits change the ETag
+        self.client.patch(detail_url, {'education': [{'institution': 'New Uni', 'start_date': '2019-01-01'}]}, format='json')
+        resp_changed = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp_changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(resp_changed['ETag'], etag)
+        # so does a newly stored preview, which sets preview_url without a new revision
+        etag = resp_changed['ETag']
+        Resume.objects.filter(pk=resume.pk).update(privacy_setting='PUBLIC', preview_revision=resume.revision)
+        resp_preview = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp_preview.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(resp_preview.data['preview_url'])
+
+    @patch('resumes.render_worker.HTML')
+    def test_pdf_and_html_etag_not_modified(self, mock_html):
+        mocked = MagicMock()
+        mocked.write_pdf.return_value = b'%PDF'
+        mock_html.return_value = mocked
+        resume = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        self.client.force_authenticate(self.user2)
+        for name in ('resume-download', 'resume-view'):
+            url = reverse(name, args=[resume.id])
+            full = self.client.get(url)
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=full['ETag'])
+            self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+            # A 304 carries the same validators as the 200
+            self.assertEqual((resp['ETag'], resp['Last-Modified']), (full['ETag'], full['Last-Modified']))
+        self.assertEqual(mocked.write_pdf.call_count, 1)
+        # Revalidations are not counted as views or downloads
+        self.assertEqual(resume_counters.pending()[resume.id], {'views': 1, 'downloads': 1})
+
     # Stats Endpoints
     def test_user_stats(self):
-        # create analytics entries
         r = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
-        Analytics = ResumeAnalytics
-        Analytics.objects.filter(resume=r).update(views=5, downloads=3)
+        for _ in range(5):
+            resume_counters.increment(r.id, 'views')
+        resume_counters.increment(r.id, 'downloads', 3)
+        resume_counters.flush()
         # favorite by user2
-        refresh2 = RefreshToken.for_user(self.user2)
         Favorite.objects.create(user=self.user2, resume=r)
-        url = reverse('user-stats')
-        resp = self.client.get(url)
-        self.assertEqual(resp.status_code, status.HTTP_200_OK)
-        data = resp.data
-        self.assertEqual(data['views'], 5)
-        self.assertEqual(data['downloads'], 3)
-        self.assertEqual(data['favorites'], 1)
+        for url in (reverse('user-stats'), '/api/me/stats/'):
+            with self.assertNumQueries(2):  # authentication, then the stats row
+                resp = self.client.get(url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp.data, {'views': 5, 'downloads': 3, 'favorites': 1})
+
+        Favorite.objects.filter(user=self.user2, resume=r).delete()
+        self.assertEqual(self.client.get(reverse('user-stats')).data['favorites'], 0)
+        Favorite.objects.create(user=self.user2, resume=r)
+        r.delete()
+        self.assertEqual(self.client.get(reverse('user-stats')).data, {'views': 0, 'downloads': 0, 'favorites': 0})
+
+    def test_reconcile_user_stats(self):
+        r = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
+        ResumeAnalytics.objects.filter(resume=r).update(views=7, downloads=2)
+        Favorite.objects.create(user=self.user2, resume=r)
+        UserStats.objects.filter(user=self.user1).update(favorites=9)
+        call_command('reconcile_user_stats', batch_size=1, stdout=StringIO())
+        self.assertEqual(UserStats.objects.filter(user=self.user1).values('views', 'downloads', 'favorites').get(),
+                         {'views': 7, 'downloads': 2, 'favorites': 1})
+        self.assertEqual(UserStats.objects.get(user=self.user2).views, 0)
 
     def test_resume_stats_owner_and_forbidden(self):
         r = self.create_minimal_resume(status='PUBLISHED', privacy='PUBLIC')
@@ -183,6 +670,323 @@ class ResumeAPITests(APITestCase):
         resp_non = self.client.get(stats_url)
         self.assertEqual(resp_non.status_code, status.HTTP_403_FORBIDDEN)
 
+class QueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='p')
+        self.viewer = User.objects.create_user(username='viewer', email='viewer@example.com', password='p')
+        for i in range(10):
+            resume = Resume.objects.create(user=self.owner, title=f'R{i}', resume_status='PUBLISHED', privacy_setting='PUBLIC')
+            PersonalDetails.objects.create(resume=resume, first_name='F', last_name='L', email='e@e.com', phone='+1')
+            Education.objects.create(resume=resume, institution='I', start_date='2020-01-01')
+            WorkExperience.objects.create(resume=resume, employer='E', role='R', start_date='2021-01-01')
+            Skill.objects.create(resume=resume, skill_name='S')
+            Award.objects.create(resume=resume, name='A', year=2020)
+            Favorite.objects.create(user=self.viewer, resume=resume)
+            refresh_resume_document(resume)
+        self.resume = resume
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {str(RefreshToken.for_user(user).access_token)}')
+
+    def test_endpoints_stay_within_budget(self):
+        self.authenticate(self.owner)
+        for url in (reverse('resume-list'), reverse('resume-detail', args=[self.resume.id]), reverse('user-stats')):
+            self.assertWithinQueryBudget(self.client.get(url))
+        self.authenticate(self.viewer)
+        self.assertWithinQueryBudget(self.client.get(reverse('public-resumes')))
+
+    @override_settings(DEBUG=True, SQL_QUERY_BUDGETS={'public-resumes': 1})
+    def test_over_budget_is_reported(self):
+        response = self.client.get(reverse('public-resumes'))
+        self.assertEqual(int(response['X-SQL-Queries']), response.sql_stats.count)
+        self.assertIn('X-SQL-Time-Ms', response)
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'query plans are only checked on PostgreSQL')
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the hot list and favorite querysets against seeded data. With enable_seqscan off
+    the planner takes any index that fits, so a Seq Scan in the plan means none matches.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'plan{i}', email=f'plan{i}@example.com', password='p')
+                     for i in range(20)]
+        Resume.objects.bulk_create([
+            Resume(user=cls.users[i % 20], title=f'Plan {i}', resume_status='PUBLISHED',
+                   privacy_setting='PUBLIC' if i % 3 else 'PRIVATE')
+            for i in range(1000)
+        ])
+        cls.resume = Resume.objects.filter(privacy_setting='PUBLIC').first()
+        Favorite.objects.bulk_create([
+            Favorite(user=user, resume=resume)
+            for user in cls.users for resume in Resume.objects.filter(privacy_setting='PUBLIC')[:20]
+            if resume.user_id != user.id
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE resumes_resume, resumes_favorite')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertNoSeqScan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan', plan, plan)
+
+    def test_public_feed(self):
+        viewer = self.users[0]
+        queryset = Resume.objects.filter(privacy_setting='PUBLIC').exclude(user=viewer).with_related()
+        self.assertNoSeqScan(queryset.with_favorites(viewer).order_by('-created_at', '-id')[:10])
+        self.assertNoSeqScan(queryset.order_by('title', 'id')[:10])
+
+    def test_own_resumes(self):
+        owner = self.users[1]
+        self.assertNoSeqScan(Resume.objects.filter(user=owner).with_related().with_favorites(owner)
+                             .order_by('-created_at')[:10])
+
+    def test_favorite_lookups(self):
+        self.assertNoSeqScan(Favorite.objects.filter(resume=self.resume, user=self.users[2]))
+        self.assertNoSeqScan(Favorite.objects.filter(resume=self.resume).values('resume').annotate(n=Count('pk')))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(APITransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='rowner', email='rowner@example.com', password='p')
+        self.reader = User.objects.create_user(username='rreader', email='rreader@example.com', password='p')
+        Resume.objects.create(user=self.owner, title='Replicated', resume_status='PUBLISHED', privacy_setting='PUBLIC')
+        self.addCleanup(cache.clear)
+
+    def test_router_sends_reads_to_replica(self):
+        self.assertEqual(Resume.objects.all().db, 'replica')
+        self.assertEqual(Resume.objects.get(title='Replicated').title, 'Replicated')
+        with transaction.atomic():
+            # inside a write transaction reads must see uncommitted rows
+            self.assertEqual(Resume.objects.all().db, 'default')
+        self.assertEqual(Resume.objects.select_for_update().db, 'default')
+
+    def test_writes_pin_client_to_primary(self):
+        self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            resp = self.client.get(reverse('public-resumes'))
+        self.assertEqual(resp.data['count'], 1)
+        self.assertTrue(replica_queries.captured_queries)
+
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.owner).access_token}')
+        resp = self.client.post(reverse('resume-list'), {
+            'title': 'Fresh', 'resume_status': 'DRAFT',
+            'personal_details': {'first_name': 'A', 'last_name': 'B', 'email': 'a@b.com', 'phone': '+1000000000'},
+            'education': [], 'work_experience': [], 'skills': [],
+        }, format='json')
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        # signed-in users are pinned by user id, not by a cookie on this client
+        self.assertNotIn('pin_primary', resp.cookies)
+        self.assertIsNotNone(cache.get(primary_pin_key(self.owner.pk)))
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            listing = self.client.get(reverse('resume-list'))
+        self.assertEqual(len(listing.data['results']), 2)
+        self.assertFalse(replica_queries.captured_queries)
+
+        # another user is not pinned by the owner's write
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.reader).access_token}')
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get(reverse('public-resumes'))
+        self.assertTrue(replica_queries.captured_queries)
+
+    def test_anonymous_pin_uses_cookie(self):
+        url = reverse('resume-preview', args=[Resume.objects.get().pk, 0])
+        self.client.cookies['pin_primary'] = '1'
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            self.client.get(url)
+        self.assertFalse(replica_queries.captured_queries)
+
+
+@override_settings(ANALYTICS_FLUSH_INTERVAL=0)
+class CounterBufferTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='counter', email='counter@example.com', password='p')
+        self.resumes = [Resume.objects.create(user=user, title=f'Counted {i}') for i in range(3)]
+        # Rows missing from older data are created by the flush
+        ResumeAnalytics.objects.filter(resume=self.resumes[2]).delete()
+
+    def test_concurrent_increments_flush_exactly(self):
+        buffer = CounterBuffer()
+
+        def hit():
+            for resume in self.resumes:
+                for _ in range(100):
+                    buffer.increment(resume.pk, 'views')
+                buffer.increment(resume.pk, 'downloads')
+
+        threads = [threading.Thread(target=hit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 3)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        # One for the resumes, one for their owner's UserStats
+        self.assertEqual(len(updates), 2)
+        for resume in self.resumes:
+            analytics = ResumeAnalytics.objects.get(resume=resume)
+            self.assertEqual((analytics.views, analytics.downloads), (800, 8))
+        stats = UserStats.objects.get(user=self.resumes[0].user)
+        self.assertEqual((stats.views, stats.downloads), (2400, 24))
+        self.assertEqual(buffer.pending(), {})
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(ResumeEvent.objects.filter(resume=self.resumes[0], event_type='VIEW').count(), 800)
+        self.assertEqual(ResumeEvent.objects.filter(event_type='DOWNLOAD').count(), 24)
+
+    def test_unique_viewer_sketches_merge_across_flushes(self):
+        buffer = CounterBuffer()
+        resume = self.resumes[0]
+        for flush in range(2):
+            for viewer in range(500 * flush, 500 * flush + 1000):
+                buffer.increment(resume.pk, 'views', viewer=f'user:{viewer}')
+            buffer.flush()
+        sketch = ResumeViewerSketch.objects.get(resume=resume)
+        self.assertEqual(len(bytes(sketch.registers)), REGISTER_COUNT)
+        estimate, per_day = unique_viewers(resume.pk, sketch.day, sketch.day + datetime.timedelta(days=1))
+        self.assertEqual(per_day, {sketch.day: estimate})
+        self.assertAlmostEqual(estimate, 1500, delta=1500 * 0.05)
+
+    def test_failed_flush_keeps_counts(self):
+        buffer = CounterBuffer()
+        buffer.increment(self.resumes[0].pk, 'downloads', 2)
+        with patch.object(CounterBuffer, '_write', side_effect=RuntimeError('database unavailable')):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        buffer.increment(self.resumes[0].pk, 'downloads')
+        self.assertEqual(buffer.pending()[self.resumes[0].pk]['downloads'], 3)
+        buffer.flush()
+        self.assertEqual(ResumeAnalytics.objects.get(resume=self.resumes[0]).downloads, 3)
+
+
+@override_settings(ANALYTICS_ROLLUP_LAG=300, ANALYTICS_EVENT_RETENTION_DAYS=7)
+class AnalyticsTimeseriesTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='ts-owner', email='ts-owner@example.com', password='p')
+        self.viewer = User.objects.create_user(username='ts-viewer', email='ts-viewer@example.com', password='p')
+        self.resume = Resume.objects.create(user=self.owner, title='Timeseries')
+        self.day = datetime.datetime(2025, 3, 1, tzinfo=datetime.timezone.utc)
+        events = [(self.day + datetime.timedelta(hours=9, minutes=m), 'VIEW') for m in range(0, 60, 10)]
+        events += [(self.day + datetime.timedelta(hours=10, minutes=5), 'DOWNLOAD'),
+                   (self.day + datetime.timedelta(days=1, hours=2), 'VIEW')]
+        ResumeEvent.objects.bulk_create([
+            ResumeEvent(resume=self.resume, event_type=event_type, occurred_at=occurred_at,
+                        recorded_at=occurred_at + datetime.timedelta(seconds=5))
+            for occurred_at, event_type in events
+        ])
+
+    def rollups(self, granularity):
+        return list(ResumeAnalyticsRollup.objects.filter(resume=self.resume, granularity=granularity)
+                    .order_by('bucket').values_list('bucket', 'views', 'downloads'))
+
+    def test_rollup_hours_and_days(self):
+        # The event recorded at 02:00:05 on the second day is still within the lag
+        position = rollup_events(now=self.day + datetime.timedelta(days=1, hours=2, minutes=3))
+        self.assertEqual(position, self.day + datetime.timedelta(days=1, hours=1))
+        self.assertEqual(self.rollups('HOUR'), [
+            (self.day + datetime.timedelta(hours=9), 6, 0),
+            (self.day + datetime.timedelta(hours=10), 0, 1),
+        ])
+        self.assertEqual(self.rollups('DAY'), [(self.day, 6, 1)])
+
+        rollup_events(now=self.day + datetime.timedelta(days=2))
+        # Running again adds nothing twice
+        rollup_events(now=self.day + datetime.timedelta(days=2))
+        self.assertEqual(self.rollups('DAY'), [(self.day, 6, 1), (self.day + datetime.timedelta(days=1), 1, 0)])
+        self.assertEqual(len(self.rollups('HOUR')), 3)
+
+    def test_late_events_are_added_and_kept_until_rolled_up(self):
+        rollup_events(now=self.day + datetime.timedelta(days=2))
+        # Flushed long after its hour was rolled up, e.g. by a process that only flushed at shutdown
+        late = ResumeEvent.objects.create(resume=self.resume, event_type='VIEW',
+                                          occurred_at=self.day + datetime.timedelta(hours=9, minutes=30),
+                                          recorded_at=self.day + datetime.timedelta(days=2, hours=1))
+        self.assertEqual(compact_events(now=self.day + datetime.timedelta(days=8)), 7)
+        self.assertEqual(compact_events(now=self.day + datetime.timedelta(days=30)), 1)
+        # However old, an event the watermark has not passed is never deleted
+        self.assertEqual(list(ResumeEvent.objects.values_list('pk', flat=True)), [late.pk])
+
+        rollup_events(now=self.day + datetime.timedelta(days=3))
+        self.assertEqual(self.rollups('HOUR')[0], (self.day + datetime.timedelta(hours=9), 7, 0))
+        self.assertEqual(self.rollups('DAY'), [(self.day, 7, 1), (self.day + datetime.timedelta(days=1), 1, 0)])
+        self.assertEqual(compact_events(now=self.day + datetime.timedelta(days=30)), 1)
+
+    def test_rollup_refuses_lag_within_flush_interval(self):
+        for interval, lag in ((0, 300), (5, 5)):
+            with self.subTest(interval=interval, lag=lag), \
+                    override_settings(ANALYTICS_FLUSH_INTERVAL=interval, ANALYTICS_ROLLUP_LAG=lag):
+                with self.assertRaises(ImproperlyConfigured):
+                    rollup_events(now=self.day + datetime.timedelta(days=2))
+        self.assertFalse(ResumeAnalyticsRollup.objects.exists())
+
+    def test_timeseries_endpoint_reads_rollups(self):
+        rollup_events(now=self.day + datetime.timedelta(days=3))
+        for offset, viewers in ((0, range(0, 40)), (1, range(30, 50))):
+            sketch = HyperLogLog()
+            for viewer in viewers:
+                sketch.add(f'user:{viewer}')
+            ResumeViewerSketch.objects.create(resume=self.resume, day=self.day.date() + datetime.timedelta(days=offset),
+                                              registers=sketch.to_bytes())
+        url = reverse('resume-timeseries', args=[self.resume.id])
+        self.client.force_authenticate(self.owner)
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(url, {'start': '2025-03-01', 'end': '2025-03-04'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertWithinQueryBudget(resp)
+        self.assertFalse(any('resumes_resumeevent' in q['sql'] for q in queries.captured_queries))
+        self.assertEqual([(p['views'], p['downloads']) for p in resp.data['series']], [(6, 1), (1, 0), (0, 0)])
+        self.assertEqual([p['unique_viewers'] for p in resp.data['series']], [40, 20, 0])
+        self.assertEqual(resp.data['unique_viewers'], 50)
+
+        resp = self.client.get(url, {'granularity': 'hour', 'start': '2025-03-01T09:00:00Z',
+                                     'end': '2025-03-01T11:00:00Z'})
+        self.assertEqual([p['views'] for p in resp.data['series']], [6, 0])
+        self.assertEqual(resp.data['unique_viewers'], 40)
+        self.assertEqual(self.client.get(url, {'granularity': 'week'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'granularity': 'hour', 'start': '2020-01-01'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.viewer)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class HyperLogLogTests(unittest.TestCase):
+    def test_estimates_stay_within_error_at_constant_size(self):
+        sketch = HyperLogLog()
+        self.assertEqual(sketch.count(), 0)
+        for count in (1, 100, 20000):
+            sketch = HyperLogLog()
+            for value in range(count):
+                sketch.add(f'user:{value}')
+                sketch.add(f'user:{value}')
+            self.assertAlmostEqual(sketch.count(), count, delta=max(1, count * 0.05))
+            self.assertEqual(len(sketch.to_bytes()), REGISTER_COUNT)
+
+    def test_merge_is_the_union(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for value in range(3000):
+            first.add(str(value))
+        for value in range(2000, 6000):
+            second.add(str(value))
+        merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+        self.assertAlmostEqual(merged.count(), 6000, delta=6000 * 0.05)
+        self.assertEqual(merged.to_bytes(), HyperLogLog.from_bytes(second.to_bytes()).merge(first).to_bytes())
+        with self.assertRaises(ValueError):
+            HyperLogLog(b'short')
+
+
 class UtilsTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='u', email='u@example.com', password='p')
@@ -210,3 +1014,252 @@ class UtilsTests(TestCase):
     def test_generate_resume_pdf_failure(self, mock_render):
         pdf = generate_resume_pdf(self.resume)
         self.assertIsNone(pdf)
+
+class TemplateRegistryTests(TestCase):
+    def test_registers_bundled_templates(self):
+        registry = TemplateRegistry()
+        self.assertIn('template_classic', registry.names())
+        self.assertIn('template_deedy', registry.names())
+        with self.assertRaises(UnknownTemplateError):
+            registry.get('template_missing')
+
+    def test_entry_is_reused_and_reloaded_on_css_change(self):
+        registry = TemplateRegistry()
+        entry = registry.get('template_classic')
+        stylesheet = entry.stylesheet
+        self.assertIs(registry.get('template_classic'), entry)
+        self.assertIs(entry.stylesheet, stylesheet)
+        self.assertIs(entry.font_config, registry.font_config)
+        # a changed mtime forces the stylesheet to be parsed again
+        entry.css_mtime = 0
+        self.assertIsNot(entry.stylesheet, stylesheet)
+
+
+class RenderServiceTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        cache_settings = override_settings(PDF_CACHE_DIR=cache_dir)
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+    @patch('resumes.render_worker.render_pdf', return_value=b'%PDF')
+    def test_inline_job_lands_in_cache(self, mock_render):
+        service = RenderService(max_workers=0, max_queue=1)
+        job_id = service.submit(RenderJob('ab' * 32, 'template_classic', '<html></html>', 'file:///'))
+        self.assertEqual(service.status(job_id), RenderJobStatus.DONE)
+        self.assertEqual(service.wait(job_id, timeout=1).read_bytes(), b'%PDF')
+
+    @patch('resumes.render_worker.render_pdf', side_effect=ValueError('broken'))
+    def test_failed_job_is_reported(self, mock_render):
+        service = RenderService(max_workers=0, max_queue=1)
+        job_id = service.submit(RenderJob('cd' * 32, 'template_classic', '<html></html>', 'file:///'))
+        self.assertEqual(service.status(job_id), RenderJobStatus.FAILED)
+        self.assertEqual(service.error(job_id), 'broken')
+        with self.assertRaises(RenderFailed):
+            service.wait(job_id, timeout=1)
+        # the failure is kept in its marker, not in the service
+        self.assertNotIn(job_id, service._jobs)
+
+    @patch('resumes.render_worker.render_pdf', side_effect=RenderWorkerDied('worker exited'))
+    def test_transient_failure_is_not_recorded(self, mock_render):
+        service = RenderService(max_workers=0, max_queue=1)
+        job_id = service.submit(RenderJob('cd' * 32, 'template_classic', '<html></html>', 'file:///'))
+        self.assertIsNone(service.status(job_id))
+        with self.assertRaises(RenderInterrupted):
+            service.wait(job_id, timeout=1)
+        self.assertIsNone(get_pdf_cache().get_marker(job_id, RenderJobStatus.FAILED))
+
+    def test_stale_markers_are_removed_on_eviction(self):
+        pdf_cache = get_pdf_cache()
+        pdf_cache.set_marker('12' * 32, RenderJobStatus.FAILED)
+        pdf_cache.set_marker('34' * 32, RenderJobStatus.PENDING)
+        os.utime(pdf_cache.marker_path('12' * 32, RenderJobStatus.FAILED), (0, 0))
+        pdf_cache.evict()
+        self.assertFalse(pdf_cache.marker_path('12' * 32, RenderJobStatus.FAILED).exists())
+        self.assertTrue(pdf_cache.marker_path('34' * 32, RenderJobStatus.PENDING).exists())
+
+    @patch('resumes.render_worker.render_pdf', side_effect=ValueError('broken'))
+    def test_job_state_is_shared_between_processes(self, mock_render):
+        # Two services stand in for two web processes sharing PDF_CACHE_DIR
+        submitter, poller = RenderService(max_workers=0, max_queue=1), RenderService(max_workers=0, max_queue=1)
+        failed_id = submitter.submit(RenderJob('cd' * 32, 'template_classic', '<html></html>', 'file:///'))
+        self.assertEqual(poller.status(failed_id), RenderJobStatus.FAILED)
+        self.assertEqual(poller.error(failed_id), 'broken')
+        with self.assertRaises(RenderFailed):
+            poller.wait(failed_id, timeout=1)
+
+        pending_id = '12' * 32
+        get_pdf_cache().set_marker(pending_id, RenderJobStatus.PENDING)
+        self.assertEqual(poller.status(pending_id), RenderJobStatus.PENDING)
+        with self.assertRaises(TimeoutError):
+            poller.wait(pending_id, timeout=0.3)
+        # A marker left behind by a dead process expires
+        marker = get_pdf_cache().marker_path(pending_id, RenderJobStatus.PENDING)
+        os.utime(marker, (0, 0))
+        self.assertIsNone(poller.status(pending_id))
+
+    def test_queue_is_bounded(self):
+        service = RenderService(max_workers=0, max_queue=0)
+        with self.assertRaises(RenderQueueFull):
+            service.submit(RenderJob('ef' * 32, 'template_classic', '<html></html>', 'file:///'))
+
+
+class RenderWorkerPoolTests(TestCase):
+    def make_pool(self, target='resumes.tests.pid_render_job', **options):
+        options = {'max_renders_per_worker': 100, 'max_rss_bytes': None, 'wall_clock_limit': 30, **options}
+        self.metrics = RenderMetrics()
+        pool = RenderWorkerPool(1, target=target, metrics=self.metrics, **options)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def run_jobs(self, pool, count):
+        futures = [pool.submit(RenderJob(f'{i:064x}', 'template_classic', '', 'file:///')) for i in range(count)]
+        return [future.result(timeout=60) for future in futures]
+
+    def test_worker_is_recycled_after_max_renders(self):
+        pool = self.make_pool(max_renders_per_worker=2)
+        first, second, third = self.run_jobs(pool, 3)
+        pool.shutdown()
+        self.assertEqual(first, second)
+        self.assertNotEqual(second, third)
+        self.assertEqual(self.metrics.workers_recycled, 1)
+        self.assertEqual(self.metrics.renders, 3)
+
+    def test_worker_is_recycled_above_rss_limit(self):
+        pool = self.make_pool(max_rss_bytes=1)
+        first, second = self.run_jobs(pool, 2)
+        pool.shutdown()
+        self.assertNotEqual(first, second)
+        self.assertEqual(self.metrics.workers_recycled, 2)
+
+    def test_watchdog_kills_slow_render(self):
+        pool = self.make_pool(target='resumes.tests.slow_render_job', wall_clock_limit=0.5)
+        future = pool.submit(RenderJob('ab' * 32, 'template_classic', '', 'file:///'))
+        with self.assertRaises(RenderTimeout):
+            future.result(timeout=60)
+        pool.shutdown()
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['renders_killed'], 1)
+        self.assertEqual(snapshot['workers_started'], 2)
+        self.assertLess(snapshot['duration_seconds']['max'], 5)
+
+
+class PDFWarmupTests(TestCase):
+    def test_rapid_schedules_are_coalesced(self):
+        fired = threading.Event()
+        callback = MagicMock(side_effect=lambda resume_id: fired.set())
+        scheduler = WarmupScheduler(callback=callback)
+        for _ in range(5):
+            scheduler.schedule(42, delay=0.05)
+        self.assertTrue(fired.wait(2))
+        time.sleep(0.1)
+        callback.assert_called_once_with(42)
+        self.assertEqual(scheduler.pending(), set())
+
+    @patch('resumes.rendering.get_render_service')
+    def test_warmup_renders_owner_and_anonymized_views(self, mock_service):
+        user = User.objects.create_user(username='w', email='w@example.com', password='p')
+        resume = Resume.objects.create(user=user, title='W', resume_status='PUBLISHED')
+        with self.assertNoLogs('resumes.warmup', level='ERROR'):
+            warm_resume_pdfs(resume.id)
+        calls = mock_service.return_value.submit_resume.call_args_list
+        self.assertEqual([c.kwargs['is_anonymized'] for c in calls], [False, True])
+        # Called synchronously inside a transaction, the caller's connection stays usable
+        self.assertTrue(Resume.objects.filter(pk=resume.id).exists())
+
+
+class OfflineTestMixin:
+    """Test fixture that fails any test which opens a network connection."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch('socket.socket.connect', side_effect=AssertionError('network access attempted'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class AssetFetcherTests(OfflineTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = AssetStore().load()
+        self.fa_root = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/'
+
+    def test_remote_urls_are_refused(self):
+        with self.assertRaises(RemoteAssetBlocked):
+            self.store.fetch('https://example.com/tracker.css')
+
+    def test_cdn_links_are_served_from_vendored_copy(self):
+        css = self.store.fetch(self.fa_root + 'css/all.min.css')
+        self.assertEqual(css['mime_type'], 'text/css')
+        self.assertIn(b'Font Awesome 5 Free', css['string'])
+        # relative font URLs inside the stylesheet resolve against the CDN URL
+        font = self.store.fetch(self.fa_root + 'webfonts/fa-solid-900.woff2')
+        self.assertEqual(font['mime_type'], 'font/woff2')
+
+    def test_static_links_are_served_from_memory(self):
+        css = self.store.fetch('file:///static/resumes/vendor/fontawesome-5.15.4/css/all.min.css')
+        with open(os.path.join(os.path.dirname(__file__), 'static/resumes/vendor/fontawesome-5.15.4/css/all.min.css'),
+                  'rb') as f:
+            self.assertEqual(css['string'], f.read())
+        # the template's own stylesheet comes pre-parsed from the registry, not from the fetcher
+        css = self.store.fetch('file:///static/resumes/css/template_classic.css?v=2')
+        self.assertEqual((css['string'], css['mime_type']), (b'', 'text/css'))
+        self.assertIsNone(self.store.get('resumes/css/template_classic.css'))
+        with self.assertRaises(RemoteAssetBlocked):
+            self.store.fetch('file:///etc/passwd')
+
+    def test_templates_render_offline(self):
+        user = User.objects.create_user(username='o', email='o@example.com', password='p')
+        resume = Resume.objects.create(user=user, title='Offline', resume_status='PUBLISHED')
+        PersonalDetails.objects.create(resume=resume, first_name='F', last_name='L', email='e@e.com', phone='+1')
+        data = sanitize_resume_data(resume)
+        for template_name in ('template_classic', 'template_deedy'):
+            html_string = render_to_string(f'resumes/{template_name}.html', {'resume': data})
+            pdf = render_pdf(RenderJob('00' * 32, template_name, html_string, 'file:///'))
+            self.assertTrue(pdf.startswith(b'%PDF'))
+
+
+class PDFCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.data = {'title': 'X', 'education': [{'start_date': '2020-01-01'}]}
+
+    def test_key_depends_on_all_inputs(self):
+        key = PDFCache.make_key(self.data, 'template_classic', b'body{}', False)
+        self.assertEqual(key, PDFCache.make_key(dict(self.data), 'template_classic', b'body{}', False))
+        self.assertNotEqual(key, PDFCache.make_key(self.data, 'template_deedy', b'body{}', False))
+        self.assertNotEqual(key, PDFCache.make_key(self.data, 'template_classic', b'body{color:red}', False))
+        self.assertNotEqual(key, PDFCache.make_key(self.data, 'template_classic', b'body{}', True))
+        self.assertNotEqual(key, PDFCache.make_key({'title': 'Y'}, 'template_classic', b'body{}', False))
+
+    def test_put_and_get(self):
+        cache = PDFCache(self.directory, max_bytes=1024)
+        self.assertIsNone(cache.get('ab' * 32))
+        path = cache.put('ab' * 32, b'%PDF')
+        self.assertEqual(cache.get('ab' * 32), path)
+        self.assertEqual(path.read_bytes(), b'%PDF')
+
+    def test_evicts_least_recently_used(self):
+        cache = PDFCache(self.directory, max_bytes=250)
+        old = cache.put('aa' * 32, b'x' * 100)
+        recent = cache.put('bb' * 32, b'x' * 100)
+        os.utime(old, (1, 1))
+        os.utime(recent, (2, 2))
+        cache.get('aa' * 32)  # touching makes "aa" the most recently used entry
+        cache.put('cc' * 32, b'x' * 100)
+        self.assertIsNotNone(cache.get('aa' * 32))
+        self.assertIsNone(cache.get('bb' * 32))
+        self.assertIsNotNone(cache.get('cc' * 32))
+
+    def test_writes_under_budget_do_not_scan(self):
+        cache = PDFCache(self.directory, max_bytes=250)
+        with patch.object(PDFCache, 'evict', autospec=True, side_effect=PDFCache.evict) as mock_evict:
+            cache.put('aa' * 32, b'x' * 100)  # the first write learns the directory's size
+            cache.put('bb' * 32, b'x' * 100)
+            cache.put('bb' * 32, b'x' * 100)  # rewriting an entry does not grow the total
+            self.assertEqual(mock_evict.call_count, 1)
+            cache.put('cc' * 32, b'x' * 100)
+            self.assertEqual(mock_evict.call_count, 2)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.directory)), 2)
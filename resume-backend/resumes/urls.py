@@ -5,15 +5,24 @@ from .views import (
     ResumeListCreateView, 
     ResumeDetailView, 
     ResumePDFDownloadView, 
+    ResumeRenderJobCreateView,
+    ResumeRenderJobStatusView,
+    ResumeRenderJobPDFView,
+    ResumePreviewView,
     ToggleFavoriteResumeView,
     UserStatsView,
     ResumeStatsView,
+    ResumeTimeseriesView,
 )
 
 urlpatterns = [
     path('resumes/', ResumeListCreateView.as_view(), name='resume-list'),
     path('resumes/<int:pk>/', ResumeDetailView.as_view(), name='resume-detail'),
     path('resumes/<int:pk>/download/', ResumePDFDownloadView.as_view(), name='resume-download'),
+    path('resumes/<int:pk>/render-jobs/', ResumeRenderJobCreateView.as_view(), name='resume-render-jobs'),
+    path('resumes/<int:pk>/render-jobs/<str:job_id>/', ResumeRenderJobStatusView.as_view(), name='resume-render-job'),
+    path('resumes/<int:pk>/render-jobs/<str:job_id>/pdf/', ResumeRenderJobPDFView.as_view(), name='resume-render-job-pdf'),
+    path('resumes/<int:pk>/preview/<int:revision>.png', ResumePreviewView.as_view(), name='resume-preview'),
     path('resumes/<int:pk>/edit/', ResumeDetailView.as_view(), name="resume-edit"),
     path('public-resumes/', PublicResumesView.as_view(), name="public-resumes"),
     path('public-resumes/<int:pk>', ResumeDetailView.as_view(), name="public-resumes-detail"),
@@ -21,5 +30,6 @@ urlpatterns = [
     path('resumes/<int:pk>/favorite/', ToggleFavoriteResumeView.as_view(), name='resume-favorite'),
     path('user/stats/', UserStatsView.as_view(), name='user-stats'),
     path('resumes/<int:pk>/stats/', ResumeStatsView.as_view(), name='resume-stats'),
+    path('resumes/<int:pk>/timeseries/', ResumeTimeseriesView.as_view(), name='resume-timeseries'),
 
 ]
\ No newline at end of file
@@ -0,0 +1,70 @@
+# resumes/user_stats.py
+"""
+Per-user dashboard totals.
+
+UserStats rows are maintained incrementally (see resumes.counters and the Favorite
+signals in resumes.models), so reading them is one primary-key lookup.
+`reconcile_user_stats()` recomputes rows from ResumeAnalytics and Favorite, for
+`manage.py reconcile_user_stats` and the migration that introduced them; the
+command also recounts the denormalized Resume.favorite_count.
+"""
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+STATS_FIELDS = ("views", "downloads", "favorites")
+
+
+def compute_user_stats(user_ids, apps=global_apps):
+    """{user_id: {views, downloads, favorites}} recomputed from the source tables."""
+    ResumeAnalytics = apps.get_model("resumes", "ResumeAnalytics")
+    Favorite = apps.get_model("resumes", "Favorite")
+    totals = {user_id: dict.fromkeys(STATS_FIELDS, 0) for user_id in user_ids}
+    analytics = (
+        ResumeAnalytics.objects.filter(resume__user_id__in=user_ids)
+        .values("resume__user_id").annotate(views=Sum("views"), downloads=Sum("downloads")).order_by()
+    )
+    for row in analytics:
+        totals[row["resume__user_id"]].update(views=row["views"] or 0, downloads=row["downloads"] or 0)
+    favorites = (
+        Favorite.objects.filter(resume__user_id__in=user_ids).exclude(user_id=F("resume__user_id"))
+        .values("resume__user_id").annotate(favorites=Count("pk")).order_by()
+    )
+    for row in favorites:
+        totals[row["resume__user_id"]]["favorites"] = row["favorites"]
+    return totals
+
+
+def reconcile_user_stats(user_ids, apps=global_apps):
+    """
+    Overwrite the UserStats rows of `user_ids` with recomputed totals; returns how many were written.
+    Call inside a transaction; migrations pass their historical `apps`.
+    """
+    UserStats = apps.get_model("resumes", "UserStats")
+    # Locking first makes concurrent flushes and favorite changes wait and then apply on top
+    list(UserStats.objects.select_for_update().filter(pk__in=user_ids).values_list("pk", flat=True))
+    totals = compute_user_stats(user_ids, apps)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id, **values) for user_id, values in totals.items()],
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=list(STATS_FIELDS),
+    )
+    return len(totals)
+
+
+def reconcile_favorite_counts(user_ids, apps=global_apps):
+    """Recount Resume.favorite_count for the resumes of `user_ids` in one UPDATE."""
+    Resume = apps.get_model("resumes", "Resume")
+    Favorite = apps.get_model("resumes", "Favorite")
+    counts = Favorite.objects.filter(resume=OuterRef("pk")).order_by().values("resume").annotate(total=Count("pk"))
+    return Resume.objects.filter(user_id__in=user_ids).update(
+        favorite_count=Coalesce(Subquery(counts.values("total")), 0),
+    )
+
+
+def get_user_stats(user):
+    """The user's totals as returned by the stats endpoints."""
+    UserStats = global_apps.get_model("resumes", "UserStats")
+    stats = UserStats.objects.filter(pk=user.pk).values(*STATS_FIELDS).first()
+    return stats or dict.fromkeys(STATS_FIELDS, 0)
@@ -1,21 +1,69 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.http import HttpResponse, Http404, FileResponse
 from django.conf import settings
+import datetime
+import hashlib
+import logging
 import os
 from django.shortcuts import get_object_or_404, render
 from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, content_disposition_header
 from rest_framework import generics, permissions, status, filters, serializers
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from weasyprint import HTML, CSS
-from django.contrib.staticfiles.finders import find as find_static
 import base64
 
-from .models import Resume, Education, ResumeAnalytics, WorkExperience, Skill, PersonalDetails, Award, Favorite
-from .serializers import ResumeSerializer, PersonalDetailsSerializer, sanitize_resume_data
-from .enums import PrivacySettings, ResumeStatus
+from .models import Resume, Education, WorkExperience, Skill, PersonalDetails, Award, Favorite
+from .serializers import ResumeSerializer, PersonalDetailsSerializer
+from .enums import PrivacySettings, ResumeStatus, RollupGranularity
+from .analytics import parse_bucket_time, resume_timeseries, rollup_position, unique_viewers
+from .counters import resume_counters
+from .documents import get_resume_document, resume_template_data
+from .pagination import PublicResumeCursorPagination
+from .render_pool import RenderTimeout, RenderWorkerDied
+from .rendering import get_render_service, resume_render_key, RenderInterrupted, RenderJobStatus, RenderQueueFull
+from .user_stats import get_user_stats
+from .template_registry import template_registry, UnknownTemplateError
+from .previews import preview_path
 from users.authentication import CookieJWTAuthentication
 
+logger = logging.getLogger(__name__)
+
+
+def resume_etag(resume, *variant):
+    """ETag for a resume representation; `variant` tells apart e.g. owner and anonymized output."""
+    return '"{}"'.format("-".join(str(part) for part in (resume.pk, resume.revision, *variant)))
+
+
+def not_modified_response(request, resume, etag):
+    """
+    Return a 304 carrying the same validators as a 200 if the client's copy
+    (If-None-Match / If-Modified-Since) is current, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=int(resume.updated_at.timestamp()))
+    if response is not None:
+        set_resume_validators(response, resume, etag)
+    return response
+
+
+def set_resume_validators(response, resume, etag):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(resume.updated_at.timestamp())
+    return response
+
+
+def viewer_fingerprint(request):
+    """Identifies a viewer for unique-viewer counts: the user id, or a hash of IP and user agent."""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    client = f"{request.META.get('REMOTE_ADDR', '')}|{request.META.get('HTTP_USER_AGENT', '')}"
+    return "anon:" + hashlib.sha256(client.encode()).hexdigest()
+
+
 class ResumeStatsView(generics.RetrieveAPIView):
     """
     API endpoint to retrieve detailed stats for a resume.
@@ -41,11 +89,19 @@ class PublicResumesView(generics.ListAPIView):
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['created_at', 'updated_at', 'title', 'user__username']
     ordering = ['-created_at']
+    cursor_pagination_class = PublicResumeCursorPagination
+
+    @property
+    def paginator(self):
+        # ?pagination=cursor opts into keyset pagination; page numbers stay the default
+        if not hasattr(self, '_paginator') and self.request.query_params.get('pagination') == 'cursor':
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
 
     def get_queryset(self):
         queryset = Resume.objects.filter(
             privacy_setting=PrivacySettings.PUBLIC
-        ).select_related('analytics')
+        ).with_related().with_favorites(self.request.user)
 
         # If user is authenticated, exclude their own resumes
         if self.request.user.is_authenticated:
@@ -67,22 +123,30 @@ class ResumeHTMLView(generics.GenericAPIView):
         # print("Authenticated user:", request.user)
         # print("Resume owner:", resume.user)
 
-        if request.user != resume.user:
-            analytics, _ = ResumeAnalytics.objects.get_or_create(resume=resume)
-            analytics.views += 1
-            analytics.save()
-
         # Privacy check
         if resume.privacy_setting == PrivacySettings.PRIVATE and resume.user != request.user:
             return Response({"error": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
 
         is_owner = request.user == resume.user
         should_anonymize = resume.is_anonymized and not is_owner
-        data = sanitize_resume_data(resume, is_anonymized=should_anonymize)
+        try:
+            template = template_registry.get(resume.template)
+        except UnknownTemplateError:
+            return Response({"error": f"Unknown template: {resume.template}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return render(request, f"resumes/{resume.template}.html", {
-            "resume": data
-        })
+        etag = resume_etag(resume, "html", "a" if should_anonymize else "o", template.css_digest[:12])
+        not_modified = not_modified_response(request, resume, etag)
+        if not_modified is not None:
+            return not_modified
+
+        # Only views that are served count; refused requests and 304 revalidations do not
+        if not is_owner:
+            resume_counters.increment(resume.pk, "views", viewer=viewer_fingerprint(request))
+
+        data = resume_template_data(resume, is_anonymized=should_anonymize)
+
+        response = HttpResponse(template.render({"resume": data}, request=request))
+        return set_resume_validators(response, resume, etag)
 
 
 class ResumePDFDownloadView(generics.GenericAPIView):
@@ -92,43 +156,179 @@ class ResumePDFDownloadView(generics.GenericAPIView):
     def get(self, request, pk):
         resume = get_object_or_404(Resume, pk=pk)
 
-        if request.user != resume.user:
-            analytics, _ = ResumeAnalytics.objects.get_or_create(resume=resume)
-            analytics.downloads += 1
-            analytics.save()
-
         # Authorization
         if resume.privacy_setting == PrivacySettings.PRIVATE and resume.user != request.user:
             return Response({"error": "Not authorized"}, status=403)
 
         is_owner = request.user == resume.user
-        data = sanitize_resume_data(resume, is_anonymized=not is_owner)
 
-        profile_image = None
+        try:
+            template = template_registry.get(resume.template)
+        except UnknownTemplateError:
+            return Response({"error": f"Unknown template: {resume.template}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        html_string = render_to_string(
-             f"resumes/{resume.template}.html",
-             {"resume": data, "profile_image": profile_image},
-             request=request
-         )
+        etag = resume_etag(resume, "pdf", "o" if is_owner else "a", template.css_digest[:12])
+        not_modified = not_modified_response(request, resume, etag)
+        if not_modified is not None:
+            return not_modified
 
-        css_path = find_static(f"resumes/css/{resume.template}.css")
-        if not css_path or not os.path.exists(css_path):
-            return Response({"error": f"CSS file not found: {css_path}"}, status=500)
-        
-        base_url = f"file://{settings.BASE_DIR}"
-
-        pdf_file = HTML(
-            string=html_string,
-            base_url=base_url
-        ).write_pdf(
-            stylesheets=[CSS(filename=css_path)],
-            presentational_hints=True,
-        )
+        # Only downloads that are served count; refused requests and 304 revalidations do not
+        if not is_owner:
+            resume_counters.increment(resume.pk, "downloads")
+
+        # Render out of process; identical requests reuse the cached PDF or the in-flight job
+        render_service = get_render_service()
+        try:
+            job_id = render_service.submit_resume(resume, is_anonymized=not is_owner, request=request)
+            if render_service.status(job_id) == RenderJobStatus.FAILED:
+                # Failed (or was killed) for this revision already; not rendered again until it changes
+                return Response({"error": "Resume could not be rendered as PDF"},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            pdf_path = render_service.wait(job_id, timeout=settings.PDF_RENDER_TIMEOUT)
+        except RenderQueueFull:
+            return Response({"error": "PDF renderer is busy, please retry shortly"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+        except RenderTimeout:
+            return Response({"error": "Resume is too large to render as PDF"},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except TimeoutError:
+            return Response({"error": "PDF is still rendering", "job_id": job_id},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+        except (RenderWorkerDied, RenderInterrupted):
+            return Response({"error": "PDF renderer restarted, please retry shortly"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+        except Exception as exc:
+            # Anything else raised by the render itself (WeasyPrint errors, RenderFailed from another worker)
+            logger.warning("PDF render of resume %s failed: %s", resume.pk, exc)
+            return Response({"error": "Resume could not be rendered as PDF"},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        return set_resume_validators(pdf_file_response(resume, pdf_path), resume, etag)
+
+
+def pdf_file_response(resume, pdf_path):
+    """
+    Deliver a stored PDF without loading it into Python.
+
+    By default the file is streamed with FileResponse, which WSGI servers providing
+    wsgi.file_wrapper (e.g. gunicorn) send with os.sendfile. PDF_SENDFILE_BACKEND
+    hands the transfer to the front-end server instead: "x-accel-redirect" for nginx
+    (PDF_SENDFILE_URL_PREFIX must be an internal location aliased to PDF_CACHE_DIR)
+    or "x-sendfile" for Apache/lighttpd. Those servers set Content-Length themselves.
+    """
+    filename = f"{resume.title}.pdf"
+    backend = settings.PDF_SENDFILE_BACKEND
+
+    if backend == "x-accel-redirect":
+        response = HttpResponse(content_type="application/pdf")
+        relative_path = pdf_path.relative_to(settings.PDF_CACHE_DIR).as_posix()
+        response["X-Accel-Redirect"] = f"{settings.PDF_SENDFILE_URL_PREFIX.rstrip('/')}/{relative_path}"
+    elif backend == "x-sendfile":
+        response = HttpResponse(content_type="application/pdf")
+        response["X-Sendfile"] = str(pdf_path)
+    else:
+        return FileResponse(open(pdf_path, "rb"), as_attachment=True, filename=filename, content_type="application/pdf")
+
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+class ResumeRenderJobMixin:
+    """
+    Shared lookup for the render job endpoints.
+    A job id is the PDF cache key, so it is only accepted for the resume and viewer that produced it.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get_resume(self, request, pk):
+        resume = get_object_or_404(Resume, pk=pk)
+        if resume.privacy_setting == PrivacySettings.PRIVATE and resume.user != request.user:
+            self.permission_denied(request, message="Not authorized")
+        return resume
 
-        response = HttpResponse(pdf_file, content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="{resume.title}.pdf"'
+    def job_payload(self, resume, job_id):
+        render_service = get_render_service()
+        payload = {
+            "job_id": job_id,
+            "status": render_service.status(job_id),
+            "status_url": reverse("resume-render-job", args=[resume.pk, job_id]),
+            "pdf_url": reverse("resume-render-job-pdf", args=[resume.pk, job_id]),
+        }
+        error = render_service.error(job_id)
+        if error:
+            payload["error"] = error
+        return payload
+
+    def check_job(self, request, resume, job_id):
+        try:
+            expected_id, _, _ = resume_render_key(resume, is_anonymized=request.user != resume.user)
+        except UnknownTemplateError:
+            raise Http404
+        if job_id != expected_id:
+            raise Http404("Unknown or outdated render job")
+
+
+class ResumeRenderJobCreateView(ResumeRenderJobMixin, generics.GenericAPIView):
+    """Queue a PDF render for a resume and return the job id to poll"""
+
+    def post(self, request, pk):
+        resume = self.get_resume(request, pk)
+        try:
+            job_id = get_render_service().submit_resume(resume, is_anonymized=request.user != resume.user, request=request)
+        except UnknownTemplateError:
+            return Response({"error": f"Unknown template: {resume.template}"}, status=status.HTTP_400_BAD_REQUEST)
+        except RenderQueueFull:
+            return Response({"error": "PDF renderer is busy, please retry shortly"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "5"})
+
+        return Response(self.job_payload(resume, job_id), status=status.HTTP_202_ACCEPTED)
+
+
+class ResumeRenderJobStatusView(ResumeRenderJobMixin, generics.GenericAPIView):
+    """Poll the status of a render job"""
+
+    def get(self, request, pk, job_id):
+        resume = self.get_resume(request, pk)
+        self.check_job(request, resume, job_id)
+        payload = self.job_payload(resume, job_id)
+        if payload["status"] is None:
+            raise Http404("Unknown render job")
+        return Response(payload)
+
+
+class ResumeRenderJobPDFView(ResumeRenderJobMixin, generics.GenericAPIView):
+    """Download the PDF produced by a finished render job"""
+
+    def get(self, request, pk, job_id):
+        resume = self.get_resume(request, pk)
+        self.check_job(request, resume, job_id)
+        render_service = get_render_service()
+        job_status = render_service.status(job_id)
+        if job_status == RenderJobStatus.PENDING:
+            return Response(self.job_payload(resume, job_id), status=status.HTTP_409_CONFLICT)
+        if job_status != RenderJobStatus.DONE:
+            raise Http404("Render job has no PDF")
+        return pdf_file_response(resume, render_service.wait(job_id, timeout=0))
+
+class ResumePreviewView(generics.GenericAPIView):
+    """
+    Serve a stored gallery thumbnail for a public resume.
+    URLs carry the revision, so responses are immutable and cached for a year.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk, revision):
+        resume = get_object_or_404(Resume, pk=pk, privacy_setting=PrivacySettings.PUBLIC)
+        path = preview_path(resume.pk, revision)
+        if not path.exists():
+            # Previews are generated after writes only; anonymous reads never schedule work
+            raise Http404("Preview not available")
+
+        response = FileResponse(open(path, "rb"), content_type="image/png")
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
         return response
+
+
 class ResumeListCreateView(generics.ListCreateAPIView):
     """
     API to list all resumes and create a new resume.
@@ -145,7 +345,7 @@ class ResumeListCreateView(generics.ListCreateAPIView):
         return super().create(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Resume.objects.filter(user=self.request.user)
+        return Resume.objects.filter(user=self.request.user).with_related().with_favorites(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -180,7 +380,7 @@ class ResumeDetailView(generics.RetrieveUpdateDestroyAPIView):
         return [permissions.IsAuthenticated()]
 
     def get_queryset(self):
-        return Resume.objects.filter(user=self.request.user)
+        return Resume.objects.filter(user=self.request.user).select_related('document')
     
     def check_object_permissions(self, request, obj):
         if obj.privacy_setting == PrivacySettings.PRIVATE and obj.user != request.user:
@@ -190,9 +390,17 @@ class ResumeDetailView(generics.RetrieveUpdateDestroyAPIView):
     def retrieve(self, request, *args, **kwargs):
         """
         Returns the resume along with all related sections.
+        Answers If-None-Match with 304 before serializing anything.
         """
         instance = self.get_object()
-        return Response(ResumeSerializer(instance).data)
+        # preview_url comes from preview_revision, which changes without a new revision
+        preview = "" if instance.preview_revision is None else instance.preview_revision
+        etag = resume_etag(instance, f"p{preview}")
+        not_modified = not_modified_response(request, instance, etag)
+        if not_modified is not None:
+            return not_modified
+        serializer = ResumeSerializer(instance, context={'document': get_resume_document(instance)})
+        return set_resume_validators(Response(serializer.data), instance, etag)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -224,52 +432,110 @@ class ResumeDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Response({"message": "Resume deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 class ToggleFavoriteResumeView(generics.GenericAPIView):
+    """
+    Favorite or unfavorite a resume. One locking lookup tells whether the user has already favorited it
+    and one DELETE or INSERT flips it; the Favorite signals keep Resume.favorite_count and the owner's
+    UserStats in step within the same transaction. `?compact=true` returns only `is_favorited` and
+    `favorite_count` instead of also serializing the whole resume.
+    """
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [CookieJWTAuthentication]
 
+    @transaction.atomic
     def post(self, request, pk):
-        resume = get_object_or_404(Resume, pk=pk)
-        if resume.user == request.user:
+        own_favorite = Favorite.objects.filter(resume=OuterRef('pk'), user=request.user).values('pk')[:1]
+        resume = get_object_or_404(
+            Resume.objects.select_for_update().only('pk', 'user_id', 'favorite_count').annotate(
+                favorite_id=Subquery(own_favorite),
+            ),
+            pk=pk,
+        )
+        if resume.user_id == request.user.id:
             return Response({"error": "Cannot favorite your own resume."}, status=status.HTTP_400_BAD_REQUEST)
-        was_favorited = resume.favorited_by.filter(user=request.user).exists()
-        
-        if was_favorited:
-            Favorite.objects.filter(user=request.user, resume=resume).delete()
+
+        # The lookup's snapshot predates the lock, so a concurrent toggle (a double click) that
+        # committed while we waited is only seen as a missing row or a duplicate insert below.
+        # Either way the other request already did what this one asked for.
+        favorite_count = resume.favorite_count
+        if resume.favorite_id is not None:
+            # A queryset delete only sends post_delete (and so decrements the counts) for rows it found
+            deleted, _ = Favorite.objects.filter(pk=resume.favorite_id).delete()
+            if deleted:
+                favorite_count = max(favorite_count - 1, 0)
         else:
-            Favorite.objects.create(user=request.user, resume=resume)
-        
-        # Force refresh from database
-        resume.refresh_from_db()
-        
+            try:
+                with transaction.atomic():
+                    Favorite.objects.create(user=request.user, resume_id=resume.pk)
+                favorite_count += 1
+            except IntegrityError:
+                pass
+        is_favorited = resume.favorite_id is None
+
+        if request.query_params.get('compact') in ('1', 'true'):
+            return Response({"is_favorited": is_favorited, "favorite_count": favorite_count})
+
+        resume = Resume.objects.with_related().with_favorites(request.user).get(pk=pk)
         serializer = ResumeSerializer(resume, context={
             'request': request  # Crucial for is_favorited calculation
         })
-        
         return Response({
-            "is_favorited": not was_favorited,
+            "is_favorited": is_favorited,
+            "favorite_count": favorite_count,
             "resume": serializer.data
         })
 
 class UserStatsView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [CookieJWTAuthentication]
-    
+
     def get(self, request):
-        user = request.user
-        total_views = ResumeAnalytics.objects.filter(
-            resume__user=user
-        ).aggregate(total=Sum('views'))['total'] or 0
-        
-        total_downloads = ResumeAnalytics.objects.filter(
-            resume__user=user
-        ).aggregate(total=Sum('downloads'))['total'] or 0
-        
-        total_favorites = Favorite.objects.filter(
-            resume__user=user
-        ).exclude(user=user).count()
+        return Response(get_user_stats(request.user))
+
+
+class ResumeTimeseriesView(generics.GenericAPIView):
+    """
+    Views and downloads of a resume over time, for its owner.
+    `?granularity=hour|day` (default day), `start` and `end` as ISO dates or datetimes (end exclusive,
+    default now). Answered from the hourly/daily rollups, so the most recent hour is not included yet;
+    `rolled_up_to` says how far the rollups go. `unique_viewers` is a HyperLogLog estimate over the
+    whole days the range touches; daily buckets also carry their own estimate.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [CookieJWTAuthentication]
+    default_ranges = {
+        RollupGranularity.HOUR: datetime.timedelta(hours=48),
+        RollupGranularity.DAY: datetime.timedelta(days=30),
+    }
+
+    def get(self, request, pk):
+        resume = get_object_or_404(Resume.objects.only('pk', 'user_id'), pk=pk)
+        if resume.user_id != request.user.id:
+            return Response({"error": "Not authorized"}, status=status.HTTP_403_FORBIDDEN)
+
+        granularity = request.query_params.get('granularity', 'day').upper()
+        if granularity not in RollupGranularity.values:
+            return Response({"error": "granularity must be 'hour' or 'day'"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = parse_bucket_time(request.query_params['end']) if 'end' in request.query_params else timezone.now()
+            start = (parse_bucket_time(request.query_params['start']) if 'start' in request.query_params
+                     else end - self.default_ranges[granularity])
+            if start >= end:
+                raise ValueError("start must be before end")
+            series = resume_timeseries(resume.pk, granularity, start, end)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        first_day = start.astimezone(datetime.timezone.utc).date()
+        last_day = (end - datetime.timedelta(microseconds=1)).astimezone(datetime.timezone.utc).date()
+        total_unique, daily_unique = unique_viewers(resume.pk, first_day, last_day + datetime.timedelta(days=1))
+        if granularity == RollupGranularity.DAY:
+            for point in series:
+                point["unique_viewers"] = daily_unique.get(point["bucket"].date(), 0)
 
         return Response({
-            'views': total_views,
-            'downloads': total_downloads,
-            'favorites': total_favorites
-        })
\ No newline at end of file
+            "resume": resume.pk,
+            "granularity": granularity.lower(),
+            "rolled_up_to": rollup_position(),
+            "unique_viewers": total_unique,
+            "series": series,
+        })
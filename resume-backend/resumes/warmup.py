@@ -0,0 +1,92 @@
+# resumes/warmup.py
+"""
+Background PDF warmup for resumes that just became downloadable.
+
+When a resume is published or made public, the owner and anonymized PDFs are
+rendered ahead of time so the first download is served from the PDF cache, and
+public resumes get a fresh gallery preview (also after edits while public).
+Requests are debounced per resume: every new save restarts the timer, so an
+editing session that saves repeatedly only renders once it settles.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def warm_resume_pdfs(resume_id):
+    """
+    Queue owner and anonymized renders for a resume; cached or in-flight variants are skipped.
+    Public resumes also get a gallery preview for their current revision.
+    """
+    from .enums import PrivacySettings
+    from .models import Resume
+    from .previews import generate_preview, PreviewError
+    from .rendering import get_render_service, RenderQueueFull
+    from .template_registry import UnknownTemplateError
+
+    try:
+        resume = Resume.objects.filter(pk=resume_id).first()
+        if resume is None:
+            return
+        render_service = get_render_service()
+        for is_anonymized in (False, True):
+            try:
+                render_service.submit_resume(resume, is_anonymized=is_anonymized)
+            except (RenderQueueFull, UnknownTemplateError) as exc:
+                logger.warning("Skipping PDF warmup for resume %s: %s", resume_id, exc)
+                return
+
+        if resume.privacy_setting == PrivacySettings.PUBLIC:
+            try:
+                generate_preview(resume)
+            except PreviewError as exc:
+                logger.warning("Skipping preview for resume %s: %s", resume_id, exc)
+    except Exception:
+        logger.exception("PDF warmup failed for resume %s", resume_id)
+
+
+class WarmupScheduler:
+    def __init__(self, callback=warm_resume_pdfs):
+        self.callback = callback
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, resume_id, delay=None):
+        """(Re)start the warmup timer for a resume, replacing any pending one."""
+        if delay is None:
+            delay = settings.PDF_WARMUP_DELAY
+        with self._lock:
+            pending = self._timers.pop(resume_id, None)
+            if pending is not None:
+                pending.cancel()
+            timer = threading.Timer(delay, self._run, args=(resume_id,))
+            timer.daemon = True
+            self._timers[resume_id] = timer
+            timer.start()
+
+    def _run(self, resume_id):
+        with self._lock:
+            if self._timers.get(resume_id) is threading.current_thread():
+                del self._timers[resume_id]
+        # Timer threads get their own DB connection; drop it on the way out.
+        # The callback itself stays safe to call from a request or a transaction.
+        close_old_connections()
+        try:
+            self.callback(resume_id)
+        finally:
+            close_old_connections()
+
+    def pending(self):
+        with self._lock:
+            return set(self._timers)
+
+
+warmup_scheduler = WarmupScheduler()
+
+
+def schedule_pdf_warmup(resume_id):
+    warmup_scheduler.schedule(resume_id)
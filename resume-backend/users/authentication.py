@@ -1,16 +1,33 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
     Custom JWT authentication class that checks for the JWT in cookies if not found in headers.
     """
-    def authenticate(self, request):
+    def get_request_raw_token(self, request):
         header = self.get_header(request)
         if header is None:
-            raw_token = request.COOKIES.get("access")
-        else:
-            raw_token = self.get_raw_token(header)
+            return request.COOKIES.get("access")
+        return self.get_raw_token(header)
+
+    def authenticate(self, request):
+        raw_token = self.get_request_raw_token(request)
         if raw_token is None:
             return None
         validated_token = self.get_validated_token(raw_token)
         return self.get_user(validated_token), validated_token
+
+    def get_request_user_id(self, request):
+        """
+        The user id claim of the request's valid access token, or None.
+        Never raises and never queries the database, so middleware can call it before the view.
+        """
+        raw_token = self.get_request_raw_token(request)
+        if raw_token is None:
+            return None
+        try:
+            return self.get_validated_token(raw_token).get(api_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
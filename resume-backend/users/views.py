@@ -24,10 +24,7 @@ from django.shortcuts import redirect
 import resend
 from threading import Timer
 
-from sympy import Sum
-
-from resumes.enums import PrivacySettings
-from resumes.models import Favorite, Resume, ResumeAnalytics
+from resumes.user_stats import get_user_stats
 from users.authentication import CookieJWTAuthentication
 # from users.utils import TimedTokenGenerator
 
@@ -175,19 +172,7 @@ class UserStatsView(generics.GenericAPIView):
     authentication_classes = [CookieJWTAuthentication]
     
     def get(self, request):
-        user = request.user
-        public_resumes = Resume.objects.filter(user=user, privacy_setting=PrivacySettings.PUBLIC)
-        analytics = ResumeAnalytics.objects.filter(resume__in=public_resumes)
-
-        total_views = analytics.aggregate(total=Sum("views"))["total"] or 0
-        total_downloads = analytics.aggregate(total=Sum("downloads"))["total"] or 0
-        total_favorites = Favorite.objects.filter(resume__in=public_resumes).exclude(user=user).count()
-
-        return Response({
-            "views": total_views,
-            "downloads": total_downloads,
-            "favorites": total_favorites
-        })
+        return Response(get_user_stats(request.user))
 
 
 class VerifyEmailView(APIView):